@@ -0,0 +1,97 @@
+"""Batch scoring throughput: `/healthScore/batch` vs a client calling `/healthScore` once per item.
+
+Run from the server directory:
+
+    python -m benchmarks.batchBench --items 200 --latency lognormal:0.4,0.3
+
+Drives the endpoints in-process against the fake Gemini backend. Every item is a distinct
+summary and the cache is bypassed, so each one costs a model call. "loop" awaits one
+request after another, as a nightly job iterating over users would; "batch" sends all
+items in one request at each `--concurrency` level and reads the NDJSON stream.
+
+Afterwards it checks that a batch running longer than the request deadline still
+succeeds for every item (the deadline applies per item), and exits non-zero if not.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.fakeGemini import FakeGeminiClient
+from main import app
+
+NO_CACHE = {"Cache-Control": "no-cache"}
+
+
+def summaries(count: int) -> list:
+    return [
+        {"id": f"user-{n}", "message": f"Monthly income ${2000 + n}. Spent ${1500 + 3 * n} of a $1,800 budget. Savings ${100 * n}."}
+        for n in range(count)
+    ]
+
+
+async def loop(http: httpx.AsyncClient, items: list, concurrency: int) -> int:
+    ok = 0
+    for item in items:
+        response = await http.post("/bloomLogic/healthScore", json={"message": item["message"]}, headers=NO_CACHE)
+        ok += response.status_code == 200
+    return ok
+
+
+async def batch(http: httpx.AsyncClient, items: list, concurrency: int) -> int:
+    body = {"items": items, "concurrency": concurrency}
+    ok = 0
+    async with http.stream("POST", "/bloomLogic/healthScore/batch", json=body, headers=NO_CACHE) as response:
+        async for line in response.aiter_lines():
+            if line:
+                ok += json.loads(line)["event"] == "result"
+    return ok
+
+
+async def deadlineCheck(http: httpx.AsyncClient, deadline: float = 1.0) -> None:
+    # 12 items of ~0.3s at concurrency 2 take ~1.8s, well past the 1s request deadline
+    items = summaries(12)
+    body = {"items": items, "concurrency": 2}
+    headers = {**NO_CACHE, "X-Request-Timeout": str(deadline)}
+    started = time.perf_counter()
+    response = await http.post("/bloomLogic/healthScore/batch", json=body, headers=headers)
+    elapsed = time.perf_counter() - started
+    summary = json.loads(response.text.splitlines()[-1])
+    print(f"deadline check: {summary['succeeded']}/{summary['total']} items ok in {elapsed:.1f}s (deadline {deadline:g}s)")
+    assert elapsed > deadline, "batch finished inside the deadline; the check proves nothing"
+    assert summary["failed"] == 0, f"batch items failed after the request deadline: {response.text}"
+
+
+async def run(count: int, latency: str, levels: list) -> None:
+    app.state.gemini_client = FakeGeminiClient(latency=latency)
+    items = summaries(count)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            print(f"{'mode':<16} {'ok':>5} {'seconds':>8} {'items/s':>8}")
+            for name, call, concurrency in [("loop", loop, 1)] + [(f"batch c={level}", batch, level) for level in levels]:
+                started = time.perf_counter()
+                ok = await call(http, items, concurrency)
+                elapsed = time.perf_counter() - started
+                print(f"{name:<16} {ok:>5} {elapsed:>8.2f} {count / elapsed:>8.1f}")
+    app.state.gemini_client = FakeGeminiClient(latency="fixed:0.3")
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            await deadlineCheck(http)
+    app.state.gemini_client = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--latency", default="lognormal:0.4,0.3", help="fake model latency spec")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+    asyncio.run(run(args.items, args.latency, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
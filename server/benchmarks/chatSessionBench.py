@@ -0,0 +1,98 @@
+"""Prompt size per turn over a long chat: server-side sessions vs the client resending history.
+
+Run from the server directory:
+
+    python -m benchmarks.chatSessionBench --turns 100
+
+Drives `/bloomLogic/chat` in-process against the fake Gemini backend and records the
+prompt the model receives on every turn. "stateless" is the old way of keeping context,
+with the client pasting the whole transcript into `message`; "session" sends only the new
+message with a `sessionId`.
+
+Fails if the session prompt keeps growing: over the last block of turns it may be at most
+`FLAT_TOLERANCE` larger than over the first block after the window fills.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.fakeGemini import FakeGeminiClient
+from main import app
+
+# Turns per report row; the session prompt rises and falls as old turns are summarized
+BLOCK_TURNS = 10
+# Slack for numbers gaining digits as the conversation goes on
+FLAT_TOLERANCE = 1.05
+
+
+class RecordingClient(FakeGeminiClient):
+    """Fake client that remembers the size of every chat prompt it receives."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.chat_prompt_bytes = []
+        generate = self.aio.models.generate_content
+
+        async def recordingGenerate(model: str, contents: str):
+            if "Financial Data Assistant" in contents:
+                self.chat_prompt_bytes.append(len(contents.encode("utf-8")))
+            return await generate(model=model, contents=contents)
+
+        self.aio.models.generate_content = recordingGenerate
+
+
+def userMessage(turn: int) -> str:
+    return f"Turn {turn}: I spent ${20 + turn}.50 on groceries this week. How does that fit my $400 monthly food budget?"
+
+
+async def converse(turns: int, use_session: bool) -> list:
+    client = RecordingClient(latency="fixed:0.001")
+    app.state.gemini_client = client
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            session_id = None
+            if use_session:
+                session_id = (await http.post("/bloomLogic/chat/sessions")).json()["sessionId"]
+            transcript = []
+            for turn in range(1, turns + 1):
+                message = userMessage(turn)
+                if use_session:
+                    body = {"message": message, "sessionId": session_id}
+                else:
+                    body = {"message": "\n".join(transcript + [f"User: {message}"])}
+                response = await http.post("/bloomLogic/chat", json=body)
+                response.raise_for_status()
+                transcript += [f"User: {message}", f"Assistant: {response.json()['message']}"]
+                # Let the background summary call (if any) finish, as it would between real turns
+                await asyncio.sleep(0.01)
+    app.state.gemini_client = None
+    return client.chat_prompt_bytes
+
+
+async def run(turns: int) -> None:
+    results = {"stateless": await converse(turns, False), "session": await converse(turns, True)}
+    names = list(results)
+    print(f"{'turns':>9} " + " ".join(f"{name + ' max B':>16}" for name in names))
+    for start in range(0, turns, BLOCK_TURNS):
+        end = min(turns, start + BLOCK_TURNS)
+        row = " ".join(f"{max(results[name][start:end]):>16,}" for name in names)
+        print(f"{start + 1:>4}-{end:<4} {row}")
+    print(f"{'total':>9} " + " ".join(f"{sum(results[name]):>16,}" for name in names))
+    if turns >= 3 * BLOCK_TURNS:
+        session = results["session"]
+        settled = max(session[BLOCK_TURNS:2 * BLOCK_TURNS])
+        last = max(session[-BLOCK_TURNS:])
+        assert last <= settled * FLAT_TOLERANCE, f"session prompt grew from {settled:,} B to {last:,} B over {turns} turns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.turns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Concurrent model-backed requests overlap instead of queueing behind each other.
+
+Run from the server directory:
+
+    python -m benchmarks.concurrencyCheck --requests 12 --latency 1.0
+
+Drives `/chat`, `/insights` and `/healthScore` in-process against a fake Gemini backend
+that takes `--latency` seconds per call. One request is timed alone, then `--requests`
+of them (spread over the three endpoints) are sent at once, and the health route is
+polled while they run. Exits non-zero unless the concurrent requests all succeed in
+about the time of one and the health route answers without waiting for them.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from benchmarks.fakeGemini import FakeGeminiClient
+from main import app
+
+NO_CACHE = {"Cache-Control": "no-cache"}
+ENDPOINTS = ["/bloomLogic/chat", "/bloomLogic/insights", "/bloomLogic/healthScore"]
+# Concurrent requests may take this many times as long as one before the check fails
+OVERLAP_TOLERANCE = 2.0
+HEALTH_MAX_SECONDS = 0.25
+
+
+def body(n: int) -> dict:
+    return {"message": f"Income $3,{n:03d}. Spent $2,400 of a $2,600 budget. Savings $500. How am I doing?"}
+
+
+async def timedPost(http: httpx.AsyncClient, path: str, n: int) -> tuple:
+    started = time.perf_counter()
+    response = await http.post(path, json=body(n), headers=NO_CACHE)
+    return response.status_code, time.perf_counter() - started
+
+
+async def pollHealth(http: httpx.AsyncClient, until: asyncio.Future) -> float:
+    slowest = 0.0
+    while not until.done():
+        started = time.perf_counter()
+        await http.get("/")
+        slowest = max(slowest, time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+    return slowest
+
+
+async def run(count: int, latency: float) -> bool:
+    app.state.gemini_client = FakeGeminiClient(latency=f"fixed:{latency}")
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            _, single = await timedPost(http, ENDPOINTS[0], -1)
+
+            started = time.perf_counter()
+            requests = asyncio.gather(*(timedPost(http, ENDPOINTS[n % len(ENDPOINTS)], n) for n in range(count)))
+            health = asyncio.ensure_future(pollHealth(http, requests))
+            results = await requests
+            elapsed = time.perf_counter() - started
+            slowest_health = await health
+    app.state.gemini_client = None
+
+    failed = [status for status, _ in results if status != 200]
+    print(f"one request:      {single:.2f}s")
+    print(f"{count} concurrent:    {elapsed:.2f}s ({count * single / elapsed:.1f}x overlap)")
+    print(f"slowest health:   {slowest_health * 1000:.0f}ms")
+    ok = True
+    if failed:
+        print(f"FAIL: {len(failed)} requests failed with {failed}")
+        ok = False
+    if elapsed > OVERLAP_TOLERANCE * single:
+        print(f"FAIL: concurrent requests took more than {OVERLAP_TOLERANCE:g}x one request")
+        ok = False
+    if slowest_health > HEALTH_MAX_SECONDS:
+        print(f"FAIL: the health route waited {slowest_health:.2f}s behind model calls")
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per fake model call")
+    args = parser.parse_args()
+    if not asyncio.run(run(args.requests, args.latency)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Peak memory of CSV import: the old read-everything path vs the streaming pipeline.
+
+Run from the server directory:
+
+    python -m benchmarks.csvImportBench --rows 1000000
+
+Only the parsing and column-mapping stages are measured (no model call). The streaming
+pipeline is consumed the way `/importCSV?format=ndjson` consumes it, one page at a time.
+"""
+import argparse
+import csv
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fixtures import writeSyntheticCsv
+from services.csvPipeline import DEFAULT_BATCH_SIZE, CsvStream, iterNormalizedBatches
+
+COLUMN_MAPPING = {
+    "Transaction Name": "Name",
+    "Amount": "Amount",
+    "Transaction Type": "Type",
+    "Date": "Date",
+    "Description": "Memo",
+    "Payment Method": "Payment",
+}
+
+
+def oldPath(path: str) -> int:
+    # Mirrors the original importCSV: read, decode, StringIO, list(DictReader), per-row loop
+    with open(path, "rb") as f:
+        raw = f.read()
+    decoded = raw.decode("utf-8", errors="replace")
+    rows = list(csv.DictReader(io.StringIO(decoded)))
+    valid = 0
+    for row in rows:
+        if row.get(COLUMN_MAPPING["Transaction Name"], "").strip():
+            valid += 1
+    return valid
+
+
+def streamingPath(path: str) -> int:
+    valid = 0
+    with open(path, "rb") as f:
+        csv_stream = CsvStream(f)
+        counts = {"totalRows": 0, "skippedRows": 0}
+        for batch in iterNormalizedBatches(csv_stream, COLUMN_MAPPING, counts, DEFAULT_BATCH_SIZE):
+            valid += len(batch)
+        csv_stream.close()
+    return valid
+
+
+def measure(fn, path: str):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'file MB':>8} {'path':>10} {'seconds':>8} {'peak MB':>8}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "transactions.csv")
+            writeSyntheticCsv(path, rows)
+            size_mb = os.path.getsize(path) / 1e6
+            for name, fn in (("old", oldPath), ("streaming", streamingPath)):
+                valid, elapsed, peak = measure(fn, path)
+                assert valid == rows, (name, valid)
+                print(f"{rows:>10} {size_mb:>8.1f} {name:>10} {elapsed:>8.2f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Duplicate detection on re-import: per-row sqlite queries vs the batched set join.
+
+Run from the server directory:
+
+    python -m benchmarks.dedupeBench --rows 100000
+
+Imports a file, then an overlapping one (the second half of the first plus as many new
+rows), and times the second import's duplicate check both ways, next to the cost of
+just fingerprinting the rows.
+"""
+import argparse
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.csvImportBench import COLUMN_MAPPING
+from benchmarks.fixtures import CSV_HEADER, syntheticCsv
+from services.csvPipeline import DEFAULT_BATCH_SIZE, CsvStream, iterNormalizedBatches
+from services.transactionIndex import TransactionIndex
+
+
+def normalized(raw: bytes) -> list:
+    counts = {"totalRows": 0, "skippedRows": 0}
+    return list(iterNormalizedBatches(CsvStream(io.BytesIO(raw)), COLUMN_MAPPING, counts, DEFAULT_BATCH_SIZE))
+
+
+def overlapping(rows: int) -> tuple:
+    # Distinct names so every row is a distinct transaction
+    lines = syntheticCsv(rows * 3 // 2).decode("utf-8").splitlines()[1:]
+    lines = [line.replace("Merchant", f"Merchant{i}-", 1) for i, line in enumerate(lines)]
+    header = ",".join(CSV_HEADER)
+    first = "\n".join([header] + lines[:rows]).encode("utf-8")
+    second = "\n".join([header] + lines[rows // 2:]).encode("utf-8")
+    return first, second
+
+
+def fingerprintOnly(path: str, batches: list) -> None:
+    # The hashing both paths share; what is left over is the lookup itself
+    occurrences = {}
+    for batch in batches:
+        TransactionIndex.fingerprints(batch, occurrences)
+
+
+def perRowPath(path: str, batches: list) -> int:
+    db = sqlite3.connect(path)
+    fresh = 0
+    occurrences = {}
+    for batch in batches:
+        for key in TransactionIndex.fingerprints(batch, occurrences):
+            found = db.execute(
+                "SELECT 1 FROM transaction_index WHERE user_id = ? AND fingerprint = ?", ("bench", key)
+            ).fetchone()
+            if found is None:
+                db.execute("INSERT INTO transaction_index (user_id, fingerprint) VALUES (?, ?)", ("bench", key))
+                fresh += 1
+    db.commit()
+    db.close()
+    return fresh
+
+
+def batchedPath(path: str, batches: list) -> int:
+    index = TransactionIndex(path=path)
+    counts = {}
+    fresh = sum(len(batch) for batch in index.newOnly("bench", iter(batches), counts))
+    # The client confirms once it has stored the rows; that is when they are written
+    index.confirm("bench", counts["importToken"])
+    index.close()
+    return fresh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'path':>8} {'seconds':>8} {'new rows':>9}")
+    for rows in args.rows:
+        first, second = overlapping(rows)
+        first_batches, second_batches = normalized(first), normalized(second)
+        for name, fn in (("hashing", fingerprintOnly), ("per-row", perRowPath), ("batched", batchedPath)):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "index.db")
+                seed = TransactionIndex(path=path)
+                occurrences = {}
+                for batch in first_batches:
+                    seed.filterNew("bench", batch, occurrences)
+                seed.close()
+                started = time.perf_counter()
+                fresh = fn(path, second_batches)
+                elapsed = time.perf_counter() - started
+                assert fresh in (None, rows // 2), (name, fresh)
+                print(f"{rows:>10} {name:>8} {elapsed:>8.2f} {'-' if fresh is None else fresh:>9}")
+
+
+if __name__ == "__main__":
+    main()
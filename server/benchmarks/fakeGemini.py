@@ -0,0 +1,199 @@
+"""Local stand-in for `google.genai.Client`, for benchmarks that must not spend Gemini quota.
+
+Install it on the app before startup and the lifespan hook uses it instead of a real client:
+
+    main.app.state.gemini_client = FakeGeminiClient(latency="lognormal:0.8,0.4")
+
+Latency specs (seconds):
+    fixed:0.5               every call takes 0.5s
+    uniform:0.2,1.5         uniformly between 0.2s and 1.5s
+    lognormal:0.8,0.4       median 0.8s, sigma 0.4 of the underlying normal
+    exp:0.5                 exponential with mean 0.5s
+
+Replies are canned by prompt type, in the formats the endpoints parse: SCORE/BREAKDOWN
+text for `/healthScore`, STATUS/COLUMN_MAPPING text for `/importCSV` validation, numbered
+recommendations, and free text otherwise.
+"""
+import asyncio
+import math
+import random
+import re
+from typing import Callable, Optional
+
+HEALTH_SCORE_REPLY = (
+    "SCORE: 72\n"
+    "BREAKDOWN:\n"
+    "Budget Adherence: 30\n"
+    "Savings Rate: 20\n"
+    "Spending Consistency: 14\n"
+    "Emergency Fund: 8\n"
+    "RECOMMENDATIONS:\n"
+    "1. Cap dining out at $150 a month.\n"
+    "2. Move $50 a week into savings on payday.\n"
+    "3. Review subscriptions and cancel unused ones.\n"
+    "4. Build the emergency fund to three months of expenses."
+)
+
+RECOMMENDATIONS_REPLY = (
+    "1. Cap dining out at $150 a month.\n"
+    "2. Move $50 a week into savings on payday.\n"
+    "3. Review subscriptions and cancel unused ones.\n"
+    "4. Build the emergency fund to three months of expenses."
+)
+
+FREE_TEXT_REPLY = (
+    "Your spending is concentrated in groceries and dining, which together make up about 45% of "
+    "expenses. Income covers spending with roughly 12% left over each month. Consider setting a "
+    "weekly dining budget and automating a transfer to savings right after each paycheck."
+)
+
+# Required field -> header synonyms, used to build a plausible COLUMN_MAPPING reply
+_FIELD_GUESSES = {
+    "Transaction Name": ["transaction name", "name", "merchant", "payee", "description"],
+    "Amount": ["amount", "price", "cost", "value", "total"],
+    "Transaction Type": ["transaction type", "type", "category"],
+    "Date": ["date", "transaction date", "posting date"],
+    "Description": ["description", "notes", "memo", "details"],
+    "Payment Method": ["payment method", "payment", "method", "payment type"],
+}
+
+
+def latencySampler(spec: str, seed: Optional[int] = None) -> Callable[[], float]:
+    """Parse a latency spec like "lognormal:0.8,0.4" into a function returning seconds."""
+    rng = random.Random(seed)
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def validationReply(prompt: str) -> str:
+    """STATUS/COLUMN_MAPPING reply that maps the prompt's headers the way the model would."""
+    match = re.search(r"Column Headers: (.*)", prompt)
+    headers = [header.strip() for header in match.group(1).split(",")] if match else []
+    used = set()
+    lines = ["STATUS: VALID", "REASON: This CSV contains bank transaction data", "COLUMN_MAPPING:"]
+    for field, guesses in _FIELD_GUESSES.items():
+        found = "MISSING"
+        for guess in guesses:
+            for header in headers:
+                if header.lower() == guess and header not in used:
+                    found = header
+                    break
+            if found != "MISSING":
+                break
+        used.add(found)
+        lines.append(f"{field}: {found}")
+    return "\n".join(lines)
+
+
+def cannedReply(prompt: str) -> str:
+    if "Transaction Data Validator" in prompt:
+        return validationReply(prompt)
+    if "Financial Health Evaluator" in prompt:
+        return HEALTH_SCORE_REPLY
+    if "Do NOT recalculate it" in prompt:
+        return RECOMMENDATIONS_REPLY
+    return FREE_TEXT_REPLY
+
+
+class _Usage:
+    def __init__(self, prompt: str, text: str):
+        # Roughly four characters per token, like the real tokenizer on English text
+        self.prompt_token_count = max(1, len(prompt) // 4)
+        self.candidates_token_count = max(1, len(text) // 4)
+
+
+class _Response:
+    def __init__(self, text: str, prompt: str = ""):
+        self.text = text
+        self.usage_metadata = _Usage(prompt, text)
+
+
+class _Stream:
+    def __init__(self, chunks, delay: float):
+        self._chunks = iter(chunks)
+        self._delay = delay
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+        await asyncio.sleep(self._delay)
+        return _Response(chunk)
+
+    async def aclose(self):
+        self._chunks = iter(())
+
+
+class FakeUpstreamError(Exception):
+    """Injected failure, shaped like the SDK's 503 errors so it counts as transient."""
+
+    code = 503
+
+
+class _FakeModels:
+    def __init__(self, owner: "FakeGeminiClient"):
+        self._owner = owner
+
+    async def generate_content(self, model: str, contents: str):
+        owner = self._owner
+        owner.calls += 1
+        latency = owner.sampleLatency()
+        if owner.slow_rate and owner.rng.random() < owner.slow_rate:
+            latency *= owner.slow_factor
+        await asyncio.sleep(latency)
+        if owner.error_rate and owner.rng.random() < owner.error_rate:
+            raise FakeUpstreamError("fake upstream error")
+        return _Response(cannedReply(contents), contents)
+
+    async def generate_content_stream(self, model: str, contents: str):
+        owner = self._owner
+        owner.calls += 1
+        text = cannedReply(contents)
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + owner.words_per_chunk]) + " " for i in range(0, len(words), owner.words_per_chunk)]
+        # Spread the sampled latency over the chunks, first token included
+        return _Stream(chunks, owner.sampleLatency() / max(1, len(chunks)))
+
+
+class _FakeAio:
+    def __init__(self, owner: "FakeGeminiClient"):
+        self.models = _FakeModels(owner)
+
+    async def aclose(self):
+        pass
+
+
+class FakeGeminiClient:
+    """Async-only fake exposing `aio.models.generate_content` and `generate_content_stream`."""
+
+    def __init__(
+        self,
+        latency: str = "fixed:0.5",
+        error_rate: float = 0.0,
+        words_per_chunk: int = 4,
+        seed: Optional[int] = 7,
+        slow_rate: float = 0.0,
+        slow_factor: float = 10.0,
+    ):
+        self.sampleLatency = latencySampler(latency, seed)
+        self.error_rate = error_rate
+        # Fraction of calls that take `slow_factor` times their sampled latency (a stalled backend)
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.words_per_chunk = words_per_chunk
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.aio = _FakeAio(self)
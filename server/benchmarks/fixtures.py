@@ -0,0 +1,90 @@
+"""Synthetic input files for the benchmarks."""
+import csv
+import io
+from typing import List
+
+CSV_HEADER = ["Name", "Amount", "Type", "Date", "Memo", "Payment"]
+
+
+def _csvRow(i: int) -> list:
+    return [
+        f"Merchant {i % 500}",
+        f"${(i % 10000) / 100:.2f}",
+        "Expense" if i % 7 else "Income",
+        f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        f"Purchase number {i}",
+        "Debit Card",
+    ]
+
+
+def writeSyntheticCsv(path: str, rows: int) -> None:
+    """Write a transactions CSV with `rows` rows (same layout the app exports)."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for i in range(rows):
+            writer.writerow(_csvRow(i))
+
+
+def syntheticCsv(rows: int) -> bytes:
+    """In-memory variant of `writeSyntheticCsv`."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_HEADER)
+    for i in range(rows):
+        writer.writerow(_csvRow(i))
+    return out.getvalue().encode("utf-8")
+
+
+def syntheticTransactions(count: int) -> List[dict]:
+    """Transactions in the structured `/healthScore` request shape."""
+    return [
+        {
+            "amount": round((i * 37) % 20000 / 100 + 1, 2),
+            "transactionType": "expense" if i % 7 else "income",
+            "date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        }
+        for i in range(count)
+    ]
+
+
+def syntheticPdf(pages: int, lines_per_page: int = 45) -> bytes:
+    """Build a text PDF that looks like a bank statement, without any PDF-writing dependency."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = [b"BT /F1 9 Tf 40 800 Td 11 TL"]
+        for line in range(lines_per_page):
+            row = page * lines_per_page + line
+            text = (
+                f"2024-{row % 12 + 1:02d}-{row % 28 + 1:02d}  Merchant {row % 300:03d}  "
+                f"POS PURCHASE REF {row:08d}  Debit Card  -{(row * 37) % 50000 / 100:.2f}"
+            )
+            lines.append(f"({text}) Tj T*".encode("ascii"))
+        lines.append(b"ET")
+        stream = b"\n".join(lines)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842]"
+            b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    return bytes(out)
@@ -0,0 +1,330 @@
+"""Offline load test of the bloomLogic endpoints against a local fake Gemini backend.
+
+Run from the server directory:
+
+    python -m benchmarks.loadTest --requests 200 --concurrency 16 --latency lognormal:0.5,0.3
+    python -m benchmarks.loadTest --server uvicorn --scenarios chat importCsv --save main
+    python -m benchmarks.loadTest --compare main
+
+The app from `main.py` runs in-process (httpx over ASGI, the default) or under uvicorn in a
+child process (`--server uvicorn`, real sockets). In both cases `app.state.gemini_client` is a
+`FakeGeminiClient`, so no quota is used. Each scenario sends `--requests` requests with
+`--concurrency` in flight and reports RPS, p50/p95/p99 latency, status codes and peak RSS.
+Payloads are unique per request unless `--repeat` is given, so caches and request
+coalescing only kick in when you ask for them.
+
+`--save NAME` writes the results to `benchmarks/baselines/NAME.json`. `--compare NAME` runs
+the same scenarios and flags any whose p95 or RPS is more than `--threshold` worse, exiting
+non-zero so it can gate a change.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.fakeGemini import FakeGeminiClient
+from benchmarks.fixtures import syntheticCsv, syntheticPdf, syntheticTransactions
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def buildScenarios(args) -> Dict[str, Callable[[int], dict]]:
+    """Scenario name -> function building the request for request number i."""
+    csv_bytes = syntheticCsv(args.csv_rows)
+    pdf_bytes = syntheticPdf(args.pdf_pages)
+    transactions = syntheticTransactions(args.transactions)
+
+    def unique(i: int) -> str:
+        return "" if args.repeat else f" (request {i})"
+
+    def csvUpload(i: int) -> bytes:
+        return csv_bytes if args.repeat else csv_bytes + f"Merchant x,$1.00,Expense,2024-01-01,Unique {i},Cash\n".encode()
+
+    def pdfUpload(i: int) -> bytes:
+        # Bytes after %%EOF are ignored by PDF readers but change the document hash
+        return pdf_bytes if args.repeat else pdf_bytes + f"% request {i}\n".encode()
+
+    return {
+        "chat": lambda i: {"url": "/bloomLogic/chat", "json": {"message": f"How should I budget for groceries?{unique(i)}"}},
+        "chatStream": lambda i: {
+            "url": "/bloomLogic/chat/stream?format=ndjson",
+            "json": {"message": f"How should I budget for groceries?{unique(i)}"},
+            "stream": True,
+        },
+        "insights": lambda i: {
+            "url": "/bloomLogic/insights",
+            "json": {"message": f"Income $2400, expenses $2150, dining $420, groceries $380{unique(i)}"},
+        },
+        "healthScore": lambda i: {
+            "url": "/bloomLogic/healthScore",
+            "json": {"message": f"Budget $2000/month, spent $1850, savings $900{unique(i)}"},
+        },
+        "healthScoreLocal": lambda i: {
+            "url": "/bloomLogic/healthScore",
+            "json": {
+                "monthlyBudget": 2000,
+                "transactions": transactions,
+                "savings": 900 if args.repeat else 900 + i,
+            },
+        },
+        "processFileCsv": lambda i: {
+            "url": "/bloomLogic/processFile",
+            "files": {"file": ("transactions.csv", csvUpload(i))},
+            "data": {"user_question": "Where does most of my money go?"},
+        },
+        "processFilePdf": lambda i: {
+            "url": "/bloomLogic/processFile",
+            "files": {"file": ("statement.pdf", pdfUpload(i))},
+            "data": {"user_question": "Where does most of my money go?"},
+        },
+        "importCsv": lambda i: {"url": "/bloomLogic/importCSV", "files": {"file": ("transactions.csv", csvUpload(i))}},
+        "importCsvNdjson": lambda i: {
+            "url": "/bloomLogic/importCSV?format=ndjson",
+            "files": {"file": ("transactions.csv", csvUpload(i))},
+            "stream": True,
+        },
+    }
+
+
+async def sendOne(client: httpx.AsyncClient, request: dict):
+    """Send one request and return (status, total seconds, seconds to first body byte)."""
+    started = time.perf_counter()
+    first_byte = None
+    kwargs = {key: request[key] for key in ("json", "files", "data") if key in request}
+    async with client.stream("POST", request["url"], **kwargs) as response:
+        async for _ in response.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+    return response.status_code, time.perf_counter() - started, first_byte
+
+
+async def runScenario(client: httpx.AsyncClient, build: Callable[[int], dict], requests: int, concurrency: int) -> dict:
+    latencies = []
+    first_bytes = []
+    statuses = Counter()
+    next_index = 0
+    streaming = build(0).get("stream", False)
+
+    async def worker():
+        nonlocal next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            try:
+                status, elapsed, first_byte = await sendOne(client, build(index))
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            statuses[str(status)] += 1
+            latencies.append(elapsed)
+            if first_byte is not None:
+                first_bytes.append(first_byte)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    result = {"requests": requests, "concurrency": concurrency, "seconds": round(wall, 3), "statuses": dict(statuses)}
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    result["rps"] = round(ok / wall, 2) if wall else 0.0
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        result.update({"p50Ms": round(p50, 1), "p95Ms": round(p95, 1), "p99Ms": round(p99, 1)})
+    if streaming and first_bytes:
+        result["firstByteP50Ms"] = round(float(np.percentile(first_bytes, 50)) * 1000, 1)
+    return result
+
+
+def peakRssMb(pid: Optional[int] = None) -> Optional[float]:
+    """Peak resident set size of this process, or of `pid` on Linux."""
+    if pid is None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def fakeClient(args) -> FakeGeminiClient:
+    return FakeGeminiClient(latency=args.latency, error_rate=args.error_rate)
+
+
+async def runInProcess(args, scenarios: dict) -> dict:
+    import main
+
+    fake = fakeClient(args)
+    main.app.state.gemini_client = fake
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            for name, build in scenarios.items():
+                results[name] = await runScenario(client, build, args.requests, args.concurrency)
+                print(formatRow(name, results[name]), flush=True)
+    main.app.state.gemini_client = None
+    return {"scenarios": results, "peakRssMb": peakRssMb(), "upstreamCalls": fake.calls}
+
+
+def _freePort() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def runUvicorn(args, scenarios: dict) -> dict:
+    port = _freePort()
+    command = [
+        sys.executable, "-m", "benchmarks.loadTest", "--serve", str(port),
+        "--latency", args.latency, "--error-rate", str(args.error_rate),
+    ]
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    base_url = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            for name, build in scenarios.items():
+                results[name] = await runScenario(client, build, args.requests, args.concurrency)
+                print(formatRow(name, results[name]), flush=True)
+        return {"scenarios": results, "peakRssMb": peakRssMb(server.pid)}
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def serve(args) -> None:
+    """Child process for `--server uvicorn`: the real app with the fake client installed."""
+    import uvicorn
+
+    import main
+
+    main.app.state.gemini_client = fakeClient(args)
+    uvicorn.run(main.app, host="127.0.0.1", port=args.serve, log_level="warning")
+
+
+def formatRow(name: str, result: dict) -> str:
+    statuses = ",".join(f"{status}:{count}" for status, count in sorted(result["statuses"].items()))
+    return (
+        f"{name:<18} {result['rps']:>8.1f} {result.get('p50Ms', 0):>8.1f} {result.get('p95Ms', 0):>8.1f}"
+        f" {result.get('p99Ms', 0):>8.1f}  {statuses}"
+    )
+
+
+def gitCommit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Print per-scenario deltas against a baseline; returns True if anything regressed."""
+    regressed = False
+    print(f"\nvs baseline {baseline.get('commit')} ({baseline.get('savedAt')}), threshold {threshold:.0%}")
+    print(f"{'scenario':<18} {'rps':>16} {'p95 ms':>18}")
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None or "p95Ms" not in before or "p95Ms" not in result:
+            continue
+        rps_change = (result["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0.0
+        p95_change = (result["p95Ms"] - before["p95Ms"]) / before["p95Ms"] if before["p95Ms"] else 0.0
+        flag = rps_change < -threshold or p95_change > threshold
+        regressed |= flag
+        print(
+            f"{name:<18} {before['rps']:>7.1f}->{result['rps']:<7.1f} {before['p95Ms']:>8.1f}->{result['p95Ms']:<8.1f}"
+            f"{'  REGRESSION' if flag else ''}"
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", help="Scenarios to run (default: all)")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:0.3,0.3", help="Fake Gemini latency spec, see fakeGemini.py")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake Gemini calls that fail")
+    parser.add_argument("--server", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--csv-rows", type=int, default=2000)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=500, help="Transactions per structured /healthScore request")
+    parser.add_argument("--repeat", action="store_true", help="Send identical payloads (exercises caches and coalescing)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--save", metavar="NAME", help="Save results as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression for --compare")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    # The app logs through the root logger; keep per-request client logging out of the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if not args.scenarios:
+            args.scenarios = list(baseline["scenarios"])
+
+    scenarios = buildScenarios(args)
+    unknown = set(args.scenarios or ()) - set(scenarios)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}; choose from {', '.join(scenarios)}")
+    if args.scenarios:
+        scenarios = {name: scenarios[name] for name in args.scenarios}
+
+    print(
+        f"server={args.server} requests={args.requests} concurrency={args.concurrency} latency={args.latency}"
+        f"{' repeat' if args.repeat else ''}"
+    )
+    print(f"{'scenario':<18} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    runner = runUvicorn if args.server == "uvicorn" else runInProcess
+    results = asyncio.run(runner(args, scenarios))
+    print(f"peak RSS: {results['peakRssMb']} MB")
+
+    results.update({
+        "commit": gitCommit(),
+        "savedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: getattr(args, key) for key in (
+            "server", "requests", "concurrency", "latency", "error_rate", "csv_rows", "pdf_pages", "transactions", "repeat",
+        )},
+    })
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved baseline to {path}")
+    if baseline is not None and compare(baseline, results, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
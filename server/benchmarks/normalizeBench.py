@@ -0,0 +1,105 @@
+"""Import normalization speed: a per-row Python loop vs the column-batched numpy pipeline.
+
+Run from the server directory:
+
+    python -m benchmarks.normalizeBench --rows 100000
+
+Both paths read the same in-memory CSV, map the columns and produce the same fields
+(`amountCents`, `isoDate`, `normalizedType`); the per-row loop is what the normalization
+would cost written the straightforward way, one `float()`/`strptime()` per row.
+"""
+import argparse
+import io
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.csvImportBench import COLUMN_MAPPING
+from benchmarks.fixtures import syntheticCsv
+from services.csvPipeline import DEFAULT_BATCH_SIZE, CsvStream, iterNormalizedBatches
+from services.normalization import EXPENSE_WORDS, INCOME_WORDS, inferDateFormat
+
+
+def perRowPath(raw: bytes) -> int:
+    csv_stream = CsvStream(io.BytesIO(raw))
+    date_format = None
+    valid = 0
+    for row in csv_stream.rows():
+        name = row.get(COLUMN_MAPPING["Transaction Name"], "").strip()
+        amount = row.get(COLUMN_MAPPING["Amount"], "").strip()
+        kind = row.get(COLUMN_MAPPING["Transaction Type"], "").strip()
+        date = row.get(COLUMN_MAPPING["Date"], "").strip()
+        if not name or not amount or not kind or not date:
+            continue
+        if date_format is None:
+            date_format = inferDateFormat(np.array([date]))
+        cleaned = amount
+        for token in ("$", "€", "£", ",", "(", ")", "-", "+", " "):
+            cleaned = cleaned.replace(token, "")
+        try:
+            value = float(cleaned)
+            iso = datetime.strptime(date, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+        lowered = kind.lower()
+        if any(word in lowered for word in EXPENSE_WORDS):
+            normalized = "expense"
+        elif any(word in lowered for word in INCOME_WORDS):
+            normalized = "income"
+        else:
+            normalized = "expense" if value < 0 else None
+        {
+            "transactionName": name,
+            "amount": amount,
+            "transactionType": kind,
+            "date": date,
+            "description": row.get(COLUMN_MAPPING["Description"], "").strip(),
+            "paymentMethod": row.get(COLUMN_MAPPING["Payment Method"], "").strip(),
+            "amountCents": round(abs(value) * 100),
+            "isoDate": iso,
+            "normalizedType": normalized,
+        }
+        valid += 1
+    csv_stream.close()
+    return valid
+
+
+def columnarPath(raw: bytes, batch_size: int) -> int:
+    csv_stream = CsvStream(io.BytesIO(raw))
+    counts = {"totalRows": 0, "skippedRows": 0}
+    valid = sum(len(batch) for batch in iterNormalizedBatches(csv_stream, COLUMN_MAPPING, counts, batch_size))
+    csv_stream.close()
+    return valid
+
+
+def best(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'path':>10} {'seconds':>8} {'rows/s':>10}")
+    for rows in args.rows:
+        raw = syntheticCsv(rows)
+        paths = (
+            ("per-row", lambda: perRowPath(raw)),
+            ("columnar", lambda: columnarPath(raw, DEFAULT_BATCH_SIZE)),
+        )
+        for name, fn in paths:
+            valid, elapsed = best(fn, args.repeat)
+            assert valid == rows, (name, valid)
+            print(f"{rows:>10} {name:>10} {elapsed:>8.2f} {rows / elapsed:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
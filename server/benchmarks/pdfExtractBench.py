@@ -0,0 +1,62 @@
+"""PDF text extraction: the original serial full-document parse vs `extractPdfText`.
+
+Run from the server directory:
+
+    python -m benchmarks.pdfExtractBench --pages 50 200 500
+
+The new path is measured with the same 30,000 character budget `/processFile` uses, and
+once without a budget to show the process-pool speedup on its own.
+"""
+import argparse
+import io
+import os
+import time
+
+from PyPDF2 import PdfReader
+
+from benchmarks.fixtures import syntheticPdf
+from services.pdfExtract import extractPdfText, shutdownPdfPool
+
+MAX_CHARS = 30000
+
+
+def oldPath(pdf: bytes) -> str:
+    # Mirrors the original readFile: every page, serially, then truncated by the caller
+    reader = PdfReader(io.BytesIO(pdf))
+    texts = []
+    for page in reader.pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            continue
+    return "\n\n".join(texts)[:MAX_CHARS]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 500])
+    args = parser.parse_args()
+
+    # Warm the pool once so process start-up isn't billed to the first document
+    extractPdfText(syntheticPdf(64), None)
+
+    print(f"workers={os.getenv('PDF_WORKERS', os.cpu_count())}")
+    print(f"{'pages':>6} {'old s':>8} {'budget s':>9} {'full s':>8} {'chars old/new':>15}")
+    for pages in args.pages:
+        pdf = syntheticPdf(pages)
+        old_text, old_s = timed(oldPath, pdf)
+        new_text, budget_s = timed(extractPdfText, pdf, MAX_CHARS)
+        full_text, full_s = timed(extractPdfText, pdf, None)
+        assert new_text[:MAX_CHARS] == old_text
+        print(f"{pages:>6} {old_s:>8.2f} {budget_s:>9.2f} {full_s:>8.2f} {len(old_text):>7}/{len(new_text[:MAX_CHARS]):<7}")
+    shutdownPdfPool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Serialization time and bytes on the wire for `/importCSV` JSON responses.
+
+Run from the server directory:
+
+    python -m benchmarks.serializationBench --rows 10000 100000
+
+Builds the response body of a synthetic import once per size, then encodes it the way
+FastAPI did before (`jsonable_encoder` + `json.dumps`) and the way it does now (orjson,
+rows or columns layout), and compresses each result with gzip (and brotli when installed)
+at the middleware's settings.
+"""
+import argparse
+import gzip
+import io
+import itertools
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks.csvImportBench import COLUMN_MAPPING
+from benchmarks.fixtures import syntheticCsv
+from services.compression import DEFAULT_BROTLI_QUALITY, DEFAULT_GZIP_LEVEL, brotli
+from services.csvPipeline import DEFAULT_BATCH_SIZE, CsvStream, iterNormalizedBatches, toColumns
+from services.metrics import TimedJSONResponse, orjson
+
+
+def importBody(rows: int) -> list:
+    counts = {"totalRows": 0, "skippedRows": 0}
+    stream = CsvStream(io.BytesIO(syntheticCsv(rows)))
+    return list(itertools.chain.from_iterable(iterNormalizedBatches(stream, COLUMN_MAPPING, counts, DEFAULT_BATCH_SIZE)))
+
+
+def encoders() -> list:
+    encoders = [
+        ("json rows", lambda transactions: JSONResponse(jsonable_encoder({"transactions": transactions})).body),
+    ]
+    if orjson is not None:
+        encoders += [
+            ("orjson rows", lambda transactions: TimedJSONResponse({"transactions": transactions}).body),
+            ("orjson columns", lambda transactions: TimedJSONResponse({"columns": toColumns(transactions)}).body),
+        ]
+    return encoders
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run(sizes: list) -> None:
+    codecs = [("gzip", lambda body: gzip.compress(body, DEFAULT_GZIP_LEVEL))]
+    if brotli is not None:
+        codecs.append(("br", lambda body: brotli.compress(body, quality=DEFAULT_BROTLI_QUALITY)))
+    header = f"{'rows':>7} {'encoding':<15} {'encode ms':>9} {'raw KB':>8}"
+    header += "".join(f" {name + ' KB':>9} {name + ' ms':>8}" for name, _ in codecs)
+    print(header)
+    for rows in sizes:
+        transactions = importBody(rows)
+        for name, encode in encoders():
+            body, encode_ms = timed(encode, transactions)
+            line = f"{rows:>7} {name:<15} {encode_ms:>9.1f} {len(body) / 1024:>8.0f}"
+            for _, compress in codecs:
+                compressed, compress_ms = timed(compress, body)
+                line += f" {len(compressed) / 1024:>9.0f} {compress_ms:>8.1f}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    run(args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cold-start cost: `import main` time and time-to-first-request for each launch mode.
+
+Run from the server directory:
+
+    python -m benchmarks.startupBench --runs 5 --workers 2
+
+Every measurement starts a fresh interpreter. Time-to-first-request is measured from
+process start until `GET /` answers, so it includes imports and the lifespan hook (Gemini
+client creation with a placeholder key, which makes no network calls).
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_TIMEOUT_SECONDS = 60.0
+
+
+def freePort() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def importSeconds() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=SERVER_DIR, check=True)
+    return time.perf_counter() - started
+
+
+def firstRequestSeconds(command: list, port: int) -> float:
+    env = dict(os.environ, GEMINI_API_KEY=os.getenv("GEMINI_API_KEY", "startup-bench"), LOG_LEVEL="WARNING")
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < STARTUP_TIMEOUT_SECONDS:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with {process.returncode}: {' '.join(command)}")
+            time.sleep(0.01)
+        raise RuntimeError(f"server did not answer within {STARTUP_TIMEOUT_SECONDS}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    def uvicornMode() -> float:
+        port = freePort()
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+        return firstRequestSeconds(command, port)
+
+    def serveMode() -> float:
+        port = freePort()
+        command = [
+            sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ]
+        return firstRequestSeconds(command, port)
+
+    modes = {"import main": importSeconds, "uvicorn main:app": uvicornMode, f"serve.py x{args.workers}": serveMode}
+    print(f"{'mode':>20} {'median s':>9} {'min s':>7} {'max s':>7}")
+    for name, fn in modes.items():
+        timings = [fn() for _ in range(args.runs)]
+        print(f"{name:>20} {statistics.median(timings):>9.3f} {min(timings):>7.3f} {max(timings):>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
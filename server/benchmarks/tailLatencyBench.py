@@ -0,0 +1,94 @@
+"""Tail latency and error rate of model-backed requests with and without retries and hedging.
+
+Run from the server directory:
+
+    python -m benchmarks.tailLatencyBench --requests 400 --error-rate 0.05 --slow-rate 0.03
+
+Drives `/bloomLogic/insights` in-process against the fake Gemini backend, with a share of
+calls failing with a transient error (`--error-rate`) and a share stalling for
+`--slow-factor` times their latency (`--slow-rate`). Every request has a distinct summary
+and bypasses the cache. "before" is one attempt per call, as the server used to do;
+"retries" uses the default retry policy; "retries+hedge" also sets MODEL_HEDGE=1.
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.fakeGemini import FakeGeminiClient
+from main import app
+
+SCENARIOS = [
+    ("before", {"MODEL_MAX_ATTEMPTS": "1", "MODEL_HEDGE": "0"}),
+    ("retries", {"MODEL_MAX_ATTEMPTS": "3", "MODEL_HEDGE": "0"}),
+    ("retries+hedge", {"MODEL_MAX_ATTEMPTS": "3", "MODEL_HEDGE": "1"}),
+]
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def scenario(args, settings: dict) -> dict:
+    os.environ.update(settings)
+    client = FakeGeminiClient(
+        latency=args.latency, error_rate=args.error_rate, slow_rate=args.slow_rate, slow_factor=args.slow_factor
+    )
+    app.state.gemini_client = client
+    durations = []
+    statuses = Counter()
+    headers = {"Cache-Control": "no-cache", "X-Request-Timeout": str(args.deadline)}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            numbers = iter(range(args.requests))
+
+            async def user():
+                for n in numbers:
+                    started = time.perf_counter()
+                    body = {"message": f"Income $2,{n:03d}. Expenses $1,800. Groceries $420, dining $180."}
+                    response = await http.post("/bloomLogic/insights", json=body, headers=headers)
+                    durations.append(time.perf_counter() - started)
+                    statuses[response.status_code] += 1
+
+            await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    app.state.gemini_client = None
+    durations.sort()
+    return {
+        "ok": statuses[200] / args.requests,
+        "p50": percentile(durations, 0.50),
+        "p95": percentile(durations, 0.95),
+        "p99": percentile(durations, 0.99),
+        "calls": client.calls / args.requests,
+        "errors": {status: count for status, count in statuses.items() if status != 200},
+    }
+
+
+async def run(args) -> None:
+    print(f"{'policy':<14} {'ok %':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'calls/req':>9}  errors")
+    for name, settings in SCENARIOS:
+        result = await scenario(args, settings)
+        print(
+            f"{name:<14} {result['ok'] * 100:>6.1f} {result['p50'] * 1000:>7.0f} {result['p95'] * 1000:>7.0f}"
+            f" {result['p99'] * 1000:>7.0f} {result['calls']:>9.2f}  {result['errors'] or '-'}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:0.1,0.3", help="fake model latency spec")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-factor", type=float, default=20.0)
+    parser.add_argument("--deadline", type=float, default=10.0, help="X-Request-Timeout sent with each request")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
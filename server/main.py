@@ -1,9 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Union
 
+from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from routers import bloomLogic
+from services.admission import admissionStats, startAdmission, stopAdmission
+from services.chatSessions import ChatSessionStore
+from services.columnMapping import ColumnMappingStore
+from services.compression import CompressionMiddleware
+from services.documentStore import DocumentStore
+from services.geminiClient import createGeminiClient, closeGeminiClient
+from services.jobQueue import JobQueue
+from services.logConfig import configureLogging
+from services.metrics import MetricsMiddleware, TimedJSONResponse, renderMetrics
+from services.pdfExtract import pdfReaderClass, shutdownPdfPool
+from services.resilience import DeadlineMiddleware, resilienceStats, startResilience, stopResilience
+from services.responseCache import ResponseCache
+from services.transactionIndex import TransactionIndex
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Gemini client per process. Tests can pre-set app.state.gemini_client
+    # with a local stub to skip creating a real one.
+    owns_client = getattr(app.state, "gemini_client", None) is None
+    if owns_client:
+        app.state.gemini_client = createGeminiClient()
+    app.state.response_cache = ResponseCache.fromEnv()
+    app.state.document_store = DocumentStore.fromEnv()
+    app.state.column_mappings = ColumnMappingStore.fromEnv()
+    app.state.transaction_index = TransactionIndex.fromEnv()
+    app.state.chat_sessions = ChatSessionStore.fromEnv()
+    startAdmission()
+    startResilience()
+    app.state.job_queue = JobQueue.fromEnv(bloomLogic.jobHandlers(app))
+    await app.state.job_queue.start()
+    # PyPDF2 is imported on first use; warm it in the background so startup doesn't wait
+    asyncio.get_running_loop().run_in_executor(None, pdfReaderClass)
+    try:
+        yield
+    finally:
+        await app.state.job_queue.stop()
+        await app.state.chat_sessions.close()
+        app.state.response_cache.close()
+        app.state.document_store.close()
+        app.state.column_mappings.close()
+        app.state.transaction_index.close()
+        shutdownPdfPool()
+        stopAdmission()
+        stopResilience()
+        if owns_client:
+            await closeGeminiClient(app.state.gemini_client)
+            app.state.gemini_client = None
+
+
+# server/.env is read here, before logging and the lifespan hook read the environment
+load_dotenv()
+configureLogging()
+
+app = FastAPI(lifespan=lifespan, default_response_class=TimedJSONResponse)
+# Added first so it runs inside MetricsMiddleware, which then times the compression too
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(bloomLogic.router, prefix="/bloomLogic", tags=["bloomLogic"])
 
@@ -13,6 +74,59 @@ def read_root():
     return {"Hello": "World"}
 
 
+@app.get("/cacheStats")
+def cache_stats():
+    return {
+        "responses": app.state.response_cache.stats(),
+        "documents": app.state.document_store.stats(),
+        "columnMappings": app.state.column_mappings.stats(),
+        "transactionIndex": app.state.transaction_index.stats(),
+        "chatSessions": app.state.chat_sessions.stats(),
+    }
+
+
+@app.get("/admissionStats")
+def admission_stats():
+    return {**admissionStats(), "retries": resilienceStats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: request, stage and model-call histograms plus admission gauges."""
+    admission = admissionStats()
+    extra = []
+    if admission["limiter"] is not None:
+        extra += [
+            "# TYPE bloom_model_queue_depth gauge",
+            f"bloom_model_queue_depth {admission['limiter']['queueDepth']}",
+            "# TYPE bloom_model_active_calls gauge",
+            f"bloom_model_active_calls {admission['limiter']['active']}",
+            "# TYPE bloom_model_shed_total counter",
+            f'bloom_model_shed_total{{reason="queue_full"}} {admission["limiter"]["shedQueueFull"]}',
+            f'bloom_model_shed_total{{reason="timeout"}} {admission["limiter"]["shedTimeout"]}',
+        ]
+    if admission["singleflight"] is not None:
+        extra += [
+            "# TYPE bloom_model_coalesced_total counter",
+            f"bloom_model_coalesced_total {admission['singleflight']['coalescedRequests']}",
+        ]
+    retries = resilienceStats()
+    if retries is not None:
+        extra += [
+            "# TYPE bloom_model_retries_total counter",
+            f'bloom_model_retries_total{{outcome="retried"}} {retries["retries"]}',
+            f'bloom_model_retries_total{{outcome="denied_by_budget"}} {retries["retriesDenied"]}',
+            "# TYPE bloom_model_hedges_total counter",
+            f'bloom_model_hedges_total{{outcome="started"}} {retries["hedges"]}',
+            f'bloom_model_hedges_total{{outcome="won"}} {retries["hedgeWins"]}',
+        ]
+    jobs = app.state.job_queue.stats()
+    extra.append("# TYPE bloom_jobs gauge")
+    extra += [f'bloom_jobs{{status="{status}"}} {jobs[status]}' for status in ("queued", "running", "succeeded", "failed", "cancelled")]
+    extra += ["# TYPE bloom_jobs_deduplicated_total counter", f"bloom_jobs_deduplicated_total {jobs['deduplicated']}"]
+    return renderMetrics(extra)
+
+
 @app.get("/items/{item_id}")
 def read_item(item_id: int, q: Union[str, None] = None):
-    return {"item_id": item_id, "q": q}
\ No newline at end of file
+    return {"item_id": item_id, "q": q}
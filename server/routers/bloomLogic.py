@@ -1,41 +1,47 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import os
-from dotenv import load_dotenv
-from google import genai
 import io
 import csv
-from typing import Optional
+import itertools
+import json
+import logging
+import os
+import time
+from typing import List, Optional
 
-try:
-    from PyPDF2 import PdfReader
-except Exception:
-    PdfReader = None
+from services.batch import batchConcurrency, checkBatchSize, itemError, runBounded
+from services.chatSessions import getChatSessions
+from services.columnMapping import getColumnMappingStore, normalizeHeader
+from services.compaction import DEFAULT_PDF_MAX_CHARS, FILE_MODES, compactCsv, compactStatementText
+from services.csvPipeline import DEFAULT_BATCH_SIZE, CsvStream, iterNormalizedBatches, toColumns
+from services.documentStore import getDocumentStore
+from services.geminiClient import GEMINI_MODEL, generateContent, getGeminiClient, streamContent
+from services.healthScoreEngine import computeHealthScore, formatHealthScore
+from services.jobQueue import getJobQueue
+from services.metrics import TimedJSONResponse, timeStage
+from services.pdfExtract import extractPdfText
+from services.resilience import itemDeadline
+from services.responseCache import cacheBypassed, getResponseCache
+from services.streaming import checkStreamFormat, encodeEvent, streamTextResponse
+from services.transactionIndex import getTransactionIndex
 
 router = APIRouter()
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 
-def readFile(file_content: bytes, filename: str) -> str:
+def readFile(file_content: bytes, filename: str, max_chars: Optional[int] = None) -> str:
     """Extract text from PDF or CSV bytes and return a text representation.
 
-    - For PDF: requires `PyPDF2`; extracts page text.
+    - For PDF: requires `PyPDF2`; extracts page text, stopping once `max_chars` is reached
+      (large documents are parsed in parallel, see `services/pdfExtract.py`).
     - For CSV: decodes and returns header + first N rows as CSV text.
     """
     filename = (filename or "").lower()
     if filename.endswith(".pdf"):
-        if PdfReader is None:
-            raise RuntimeError("PyPDF2 is required to parse PDF files. Install it with `pip install PyPDF2`.")
-        reader = PdfReader(io.BytesIO(file_content))
-        texts = []
-        for page in reader.pages:
-            try:
-                texts.append(page.extract_text() or "")
-            except Exception:
-                # best-effort continue
-                continue
-        return "\n\n".join(texts)
+        return extractPdfText(file_content, max_chars)
     elif filename.endswith(".csv"):
         decoded = file_content.decode(errors="replace")
         # Read CSV and limit to first 50 rows to avoid huge payloads
@@ -61,374 +67,666 @@ def readFile(file_content: bytes, filename: str) -> str:
         raise ValueError("Unsupported file type. Only PDF and CSV are supported.")
 
 
-@router.post("/processFile")
-async def uploadFile(file: UploadFile = File(...), user_question: Optional[str] = Form(None)):
-    """Accept a PDF or CSV file and a user question, then use Gemini to extract/summarize
-    and answer the question. Makes two Gemini calls:
-      1) Summarize/extract the financial content of the file
-      2) Answer the user's question based on that summary
+def compactFile(file_content: bytes, filename: str, max_chars: int) -> tuple:
+    """Return (digest, raw_text): a locally computed digest of every transaction in a PDF or
+    CSV (see `services/compaction.py`), and the raw text to send instead when it is None.
 
-    The system prompt instructs Gemini to ONLY process financial data and to refuse non-financial files.
+    A PDF is parsed once, up to `COMPACT_PDF_MAX_CHARS` characters of text (the digest then
+    notes that it covers only the start); when no statement lines are found its text,
+    truncated to `max_chars`, is the fallback. For CSVs `raw_text` is None and callers use
+    `readFile`.
     """
-    raw = await file.read()
-    filename = getattr(file, "filename", "unknown")
+    lowered = (filename or "").lower()
+    if lowered.endswith(".pdf"):
+        limit = int(os.getenv("COMPACT_PDF_MAX_CHARS", DEFAULT_PDF_MAX_CHARS))
+        text = extractPdfText(file_content, limit)
+        # extractPdfText stops once `limit` characters, page separators included, are collected
+        digest = compactStatementText(text, filename, partial=len(text) + 2 >= limit)
+        return digest, None if digest is not None else text[:max_chars]
+    elif lowered.endswith(".csv"):
+        return compactCsv(file_content, filename), None
+    else:
+        raise ValueError("Unsupported file type. Only PDF and CSV are supported.")
 
-    try:
-        extracted_text = readFile(raw, filename)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY is not configured")
-
-    client = genai.Client(api_key=api_key)
-
-    # System prompt enforcing financial-only behavior
-    system_instruction = (
-        "SYSTEM: You are a Financial Data Assistant. You must only read and analyze financial"
-        " data (e.g., revenues, expenses, balance sheets, transactions, P&L, cash flow, account" 
-        " statements, financial metrics). If the provided file does not contain financial data"
-        " or the content is not financial in nature, respond exactly: 'I cannot help with the"
-        " provided file because it does not contain financial data.' Do not attempt to answer"
-        " non-financial questions or hallucinate financial details. Keep answers concise and"
-        " focused on the financial content present."
-    )
+# System prompt enforcing financial-only behavior for uploaded files
+FILE_SYSTEM_INSTRUCTION = (
+    "SYSTEM: You are a Financial Data Assistant. You must only read and analyze financial"
+    " data (e.g., revenues, expenses, balance sheets, transactions, P&L, cash flow, account"
+    " statements, financial metrics). If the provided file does not contain financial data"
+    " or the content is not financial in nature, respond exactly: 'I cannot help with the"
+    " provided file because it does not contain financial data.' Do not attempt to answer"
+    " non-financial questions or hallucinate financial details. Keep answers concise and"
+    " focused on the financial content present."
+)
+FILE_REFUSAL = "I cannot help with the provided file"
+
+
+async def summarizeFile(
+    file: Optional[UploadFile], document_id: Optional[str], client, documents, mode: str = "compact"
+) -> tuple:
+    """Return (document_id, summary) for an uploaded PDF/CSV or a previously uploaded document.
+
+    New files are parsed and run through the first Gemini call (extract & summarize); the
+    parsed text and summary are kept in the document store, so identical re-uploads and
+    follow-up questions by `document_id` skip straight to the answer call.
+
+    In "compact" mode the model gets a digest computed locally over every row (totals by
+    month, category and payment method, top merchants, outliers) instead of a raw text
+    prefix; files that don't parse as transactions fall back to "raw".
+    """
+    checkFileMode(mode)
+    if file is None:
+        if not document_id:
+            raise HTTPException(status_code=400, detail="Either file or document_id must be provided")
+        document = documents.get(document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired document_id. Please upload the file again.")
+        return document_id, document["summary"]
+
+    with timeStage("upload_read"):
+        raw = await file.read()
+    return await summarizeDocument(raw, getattr(file, "filename", "unknown"), client, documents, mode)
+
+
+def checkFileMode(mode: str) -> None:
+    if mode not in FILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(sorted(FILE_MODES))}")
+
+
+async def summarizeDocument(raw: bytes, filename: str, client, documents, mode: str = "compact") -> tuple:
+    """Parse uploaded bytes and run the extraction call, reusing a stored extraction if present."""
+    document_id = documents.documentId(raw, filename)
+    document = documents.get(document_id)
+    if document is not None and document.get("mode", "raw") == mode:
+        return document_id, document["summary"]
 
     # Limit the amount of file text we send in a single request to avoid very large payloads
     max_chars = 30000
-    send_text = extracted_text[:max_chars]
-
-    # First Gemini call: extract & summarize
-    extract_prompt = (
-        f"{system_instruction}\n\nHere is the file content (truncated to {max_chars} chars):\n{send_text}\n\n"
-        "Please extract and summarize the financial information present in the file. If there is"
-        " no financial information, follow the system instruction and say you cannot help."
-    )
 
+    # Parsing is CPU-bound; keep it off the event loop
     try:
-        first_resp = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=extract_prompt,
+        with timeStage("parse_file"):
+            digest, extracted_text = None, None
+            if mode == "compact":
+                digest, extracted_text = await run_in_threadpool(compactFile, raw, filename, max_chars)
+            if digest is not None:
+                extracted_text = digest
+                content_intro = "Here is a digest of every transaction in the file, computed locally"
+            else:
+                if extracted_text is None:
+                    extracted_text = await run_in_threadpool(readFile, raw, filename, max_chars)
+                content_intro = f"Here is the file content (truncated to {max_chars} chars)"
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    with timeStage("prompt_build"):
+        send_text = extracted_text[:max_chars]
+        extract_prompt = (
+            f"{FILE_SYSTEM_INSTRUCTION}\n\n{content_intro}:\n{send_text}\n\n"
+            "Please extract and summarize the financial information present in the file. If there is"
+            " no financial information, follow the system instruction and say you cannot help."
         )
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Gemini extraction call failed: {e}")
 
-    first_text = getattr(first_resp, "text", str(first_resp))
+    first_text = await generateContent(client, extract_prompt, label="Gemini extraction call")
+    documents.set(document_id, {"filename": filename, "mode": mode, "text": extracted_text, "summary": first_text})
+    return document_id, first_text
 
-    # If Gemini already refused due to non-financial content, return that message
-    if "I cannot help with the provided file" in first_text:
-        return {"message": first_text}
 
-    # Second Gemini call: answer user's question based on extracted summary
+def buildAnswerPrompt(first_text: str, user_question: Optional[str]) -> str:
+    """Prompt for the second Gemini call: answer the question from the extracted summary."""
     if not user_question:
         user_question = "Please provide a concise summary of the financial data."
 
-    answer_prompt = (
-        f"{system_instruction}\n\nI have already extracted and summarized the file as follows:\n{first_text}\n\n"
+    return (
+        f"{FILE_SYSTEM_INSTRUCTION}\n\nI have already extracted and summarized the file as follows:\n{first_text}\n\n"
         f"Now answer the user's question using only the information in the summary above."
         f" User question: {user_question}"
     )
 
-    try:
-        second_resp = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=answer_prompt,
-        )
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Gemini answer call failed: {e}")
 
-    second_text = getattr(second_resp, "text", str(second_resp))
+async def _singleChunk(text: str):
+    yield text
+
+
+@router.post("/processFile")
+async def uploadFile(
+    file: Optional[UploadFile] = File(None),
+    user_question: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    mode: str = Form("compact"),
+    client=Depends(getGeminiClient),
+    documents=Depends(getDocumentStore),
+):
+    """Accept a PDF or CSV file and a user question, then use Gemini to extract/summarize
+    and answer the question. Makes two Gemini calls:
+      1) Summarize/extract the financial content of the file
+      2) Answer the user's question based on that summary
+
+    The system prompt instructs Gemini to ONLY process financial data and to refuse non-financial files.
+    The response includes a `documentId`; sending it instead of the file for follow-up
+    questions skips the upload, parse and extraction call.
+    `mode` is "compact" (default; a locally computed digest of the whole file) or "raw"
+    (the first 30,000 characters of the file text).
+    """
+    document_id, first_text = await summarizeFile(file, document_id, client, documents, mode)
+
+    # If Gemini already refused due to non-financial content, return that message
+    if FILE_REFUSAL in first_text:
+        return {"message": first_text, "documentId": document_id}
+
+    second_text = await generateContent(client, buildAnswerPrompt(first_text, user_question), label="Gemini answer call")
+
+    return {"message": second_text, "documentId": document_id}
+
+
+@router.post("/processFile/stream")
+async def uploadFileStream(
+    http_request: Request,
+    file: Optional[UploadFile] = File(None),
+    user_question: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+    mode: str = Form("compact"),
+    format: str = "sse",
+    client=Depends(getGeminiClient),
+    documents=Depends(getDocumentStore),
+):
+    """Streaming variant of `/processFile`.
+
+    The extraction call runs first as usual; the answer is then streamed as `token` events
+    (Server-Sent Events, or NDJSON with `?format=ndjson`) followed by a `done` event with timing.
+    The document ID is returned in the `X-Document-Id` header.
+    """
+    checkStreamFormat(format)
+    document_id, first_text = await summarizeFile(file, document_id, client, documents, mode)
+
+    if FILE_REFUSAL in first_text:
+        chunks = _singleChunk(first_text)
+    else:
+        chunks = streamContent(client, buildAnswerPrompt(first_text, user_question), label="Gemini answer call")
+    return streamTextResponse(http_request, chunks, format, headers={"X-Document-Id": document_id})
+
 
-    return {"message": second_text}
-    
-    
-    
 class ChatRequest(BaseModel):
     message: str
+    sessionId: Optional[str] = None
+
+
+CHAT_SYSTEM_INSTRUCTION = (
+    "SYSTEM: You are a Financial Data Assistant. You assist with financial"
+    " data (e.g., revenues, expenses, balance sheets, transactions, P&L, cash flow, account"
+    " statements, financial metrics). If the user asks about non-financial topics,"
+    " respond exactly: 'I cannot help with that request as I only handle financial data.'"
+    " Do not attempt to answer non-financial questions. Keep answers concise and"
+    " focused on financial concepts."
+)
+
+
+@router.post("/chat/sessions", status_code=201)
+async def createChatSession(sessions=Depends(getChatSessions)):
+    """Start a server-side conversation; pass the returned `sessionId` to `/chat`."""
+    return {"sessionId": sessions.create().id}
+
+
+@router.delete("/chat/sessions/{session_id}")
+async def deleteChatSession(session_id: str, sessions=Depends(getChatSessions)):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Unknown or expired sessionId")
+    return {"success": True}
 
 
 @router.post("/chat")
-async def chat(request: ChatRequest):
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY is not configured")
-
-    client = genai.Client(api_key=api_key)
-
-    system_instruction = (
-        "SYSTEM: You are a Financial Data Assistant. You assist with financial"
-        " data (e.g., revenues, expenses, balance sheets, transactions, P&L, cash flow, account"
-        " statements, financial metrics). If the user asks about non-financial topics,"
-        " respond exactly: 'I cannot help with that request as I only handle financial data.'"
-        " Do not attempt to answer non-financial questions. Keep answers concise and"
-        " focused on financial concepts."
-    )
+async def chat(request: ChatRequest, client=Depends(getGeminiClient), sessions=Depends(getChatSessions)):
+    """Answer a chat message.
 
-    full_prompt = f"{system_instruction}\n\nUser: {request.message}"
+    With a `sessionId` the server keeps the conversation: recent turns plus a rolling
+    summary of older ones go into the prompt (see `services/chatSessions.py`), so the
+    client sends only the new message. Without one, each message stands alone.
+    """
+    if request.sessionId is None:
+        full_prompt = f"{CHAT_SYSTEM_INSTRUCTION}\n\nUser: {request.message}"
+        response_text = await generateContent(client, full_prompt, label="Gemini chat call")
+        return {"message": response_text}
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=full_prompt
-        )
-        return {"message": response.text}
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Gemini chat call failed: {e}")
+    session = sessions.require(request.sessionId)
+    async with session.lock:
+        full_prompt = sessions.buildPrompt(session, CHAT_SYSTEM_INSTRUCTION, request.message)
+        response_text = await generateContent(client, full_prompt, label="Gemini chat call")
+        sessions.record(session, request.message, response_text, client)
+    return {"message": response_text, "sessionId": session.id, "turn": session.turn_count}
+
+
+@router.post("/chat/stream")
+async def chatStream(
+    http_request: Request,
+    request: ChatRequest,
+    format: str = "sse",
+    client=Depends(getGeminiClient),
+    sessions=Depends(getChatSessions),
+):
+    """Streaming variant of `/chat`: tokens arrive as Server-Sent Events (or NDJSON with
+    `?format=ndjson`) as the model generates them, followed by a `done` event with timing.
+    A session turn is recorded once the reply has streamed completely.
+    """
+    checkStreamFormat(format)
+    if request.sessionId is None:
+        full_prompt = f"{CHAT_SYSTEM_INSTRUCTION}\n\nUser: {request.message}"
+        chunks = streamContent(client, full_prompt, label="Gemini chat call")
+        return streamTextResponse(http_request, chunks, format)
+
+    session = sessions.require(request.sessionId)
+
+    async def sessionChunks():
+        async with session.lock:
+            full_prompt = sessions.buildPrompt(session, CHAT_SYSTEM_INSTRUCTION, request.message)
+            parts = []
+            async for text in streamContent(client, full_prompt, label="Gemini chat call"):
+                parts.append(text)
+                yield text
+            sessions.record(session, request.message, "".join(parts), client)
+
+    return streamTextResponse(http_request, sessionChunks(), format, headers={"X-Session-Id": session.id})
+
+
+INSIGHTS_SYSTEM_INSTRUCTION = (
+    "SYSTEM: You are a Financial Insights Advisor for college students and low-income individuals."
+    " Your goal is to provide personalized, actionable insights based on the user's spending patterns."
+    " Analyze the financial summary provided and give 3-4 specific insights or recommendations."
+    " Focus on: spending patterns, budget optimization, savings opportunities, and financial health."
+    " Be encouraging and supportive while being honest about areas for improvement."
+    " Keep your response concise and actionable. Format with bullet points or numbered lists."
+)
 
 
 @router.post("/insights")
-async def generate_insights(request: ChatRequest):
+async def generate_insights(
+    request: ChatRequest,
+    client=Depends(getGeminiClient),
+    cache=Depends(getResponseCache),
+    bypass_cache: bool = Depends(cacheBypassed),
+):
     """Generate AI-powered financial insights from a user's financial summary.
 
     Takes a summary of the user's financial data (income, expenses, spending patterns)
-    and returns personalized insights and recommendations.
+    and returns personalized insights and recommendations. Identical summaries are served
+    from the response cache unless the client sends `Cache-Control: no-cache`.
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY is not configured")
-
-    client = genai.Client(api_key=api_key)
-
-    system_instruction = (
-        "SYSTEM: You are a Financial Insights Advisor for college students and low-income individuals."
-        " Your goal is to provide personalized, actionable insights based on the user's spending patterns."
-        " Analyze the financial summary provided and give 3-4 specific insights or recommendations."
-        " Focus on: spending patterns, budget optimization, savings opportunities, and financial health."
-        " Be encouraging and supportive while being honest about areas for improvement."
-        " Keep your response concise and actionable. Format with bullet points or numbered lists."
-    )
+    return await insightsResult(request.message, client, cache, bypass_cache)
+
+
+async def insightsResult(message: str, client, cache, bypass_cache: bool) -> dict:
+    """Insights for one summary, through the response cache; shared by `/insights` and its batch variant."""
+    cache_key = cache.makeKey("insights", GEMINI_MODEL, INSIGHTS_SYSTEM_INSTRUCTION, message)
+    cached = None if bypass_cache else cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    full_prompt = f"{INSIGHTS_SYSTEM_INSTRUCTION}\n\n{message}"
+
+    response_text = await generateContent(client, full_prompt, label="Gemini insights call")
+    result = {"message": response_text}
+    cache.set(cache_key, result)
+    return result
+
+
+class HealthScoreTransaction(BaseModel):
+    amount: float
+    transactionType: str  # "expense" or "income"
+    date: str  # yyyy-MM-dd
+
+
+class HealthScoreRequest(BaseModel):
+    # Free-text summary scored by the model (original mode)
+    message: Optional[str] = None
+    # Structured data scored locally; the model only writes recommendations
+    monthlyBudget: Optional[float] = None
+    transactions: Optional[List[HealthScoreTransaction]] = None
+    savings: Optional[float] = None
+    includeRecommendations: bool = True
 
-    full_prompt = f"{system_instruction}\n\n{request.message}"
 
+async def localHealthScore(request: HealthScoreRequest, client, cache, bypass_cache: bool) -> dict:
+    """Score structured budget/transaction data with the local engine.
+
+    The numbers never come from the model, so SCORE always equals the sum of its parts.
+    Gemini is only asked for recommendations when `includeRecommendations` is set; if that
+    call fails the scores are still returned with empty recommendations.
+    """
+    payload = json.dumps(request.model_dump(exclude={"message"}), sort_keys=True)
+    cache_key = cache.makeKey("healthScore:local", GEMINI_MODEL, "", payload)
+    cached = None if bypass_cache else cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    transactions = request.transactions or []
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=full_prompt
+        with timeStage("score_compute"):
+            result = computeHealthScore(
+                request.monthlyBudget or 0.0,
+                [t.amount for t in transactions],
+                [t.transactionType for t in transactions],
+                [t.date for t in transactions],
+                request.savings,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid transaction data: {e}")
+
+    metrics = result.pop("metrics")
+    recommendations = ""
+    cacheable = True
+    if request.includeRecommendations:
+        recommendation_prompt = (
+            "SYSTEM: You are a Financial Health Advisor for college students and low-income individuals."
+            " The user's financial health score has already been calculated. Do NOT recalculate it."
+            " Write exactly 4 short, actionable recommendations as a numbered list (1. to 4.)."
+            " No markdown and no other text.\n\n"
+            f"{formatHealthScore(result)}\n\n"
+            f"METRICS:\n{json.dumps(metrics)}\n"
+            f"Monthly Budget: {request.monthlyBudget}\nCurrent Savings: {request.savings}"
         )
-        return {"message": response.text}
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Gemini insights call failed: {e}")
+        try:
+            recommendations = await generateContent(
+                client, recommendation_prompt, label="Gemini health score recommendations call"
+            )
+            recommendations = recommendations.strip()
+        except HTTPException as e:
+            logger.warning(
+                "health score recommendations call failed", extra={"status": e.status_code, "detail": e.detail}
+            )
+            cacheable = False
+
+    result["recommendations"] = recommendations
+    result["message"] = formatHealthScore(result, recommendations)
+    if cacheable:
+        cache.set(cache_key, result)
+    return result
+
+
+HEALTH_SCORE_SYSTEM_INSTRUCTION = (
+    "SYSTEM: You are a Financial Health Evaluator. You will receive raw financial data "
+    "(budget, transactions, expenses, savings). You must analyze this data and CALCULATE "
+    "a financial health score (0-100) and a score breakdown.\n\n"
+    "SCORING CRITERIA (Total 100):\n"
+    "1. Budget Adherence (Max 40): Do they stay within budget?\n"
+    "2. Savings Rate (Max 30): Are they saving money? (Income vs Expense)\n"
+    "3. Spending Consistency (Max 20): Is spending predictable?\n"
+    "4. Emergency Fund (Max 10): Do they have savings buffer?\n\n"
+    "CRITICAL SCORING RULES:\n"
+    "- ALL scores MUST be WHOLE NUMBERS (integers) between 0 and 100\n"
+    "- NO decimal points allowed (e.g., use 27, NOT 27.5 or 27.63)\n"
+    "- Total SCORE must be between 0-100 (sum of breakdown scores)\n"
+    "- Budget Adherence: integer between 0-40\n"
+    "- Savings Rate: integer between 0-30\n"
+    "- Spending Consistency: integer between 0-20\n"
+    "- Emergency Fund: integer between 0-10\n\n"
+    "You MUST respond in EXACTLY this format:\n\n"
+    "SCORE: [integer from 0-100]\n"
+    "BREAKDOWN:\n"
+    "Budget Adherence: [integer 0-40]\n"
+    "Savings Rate: [integer 0-30]\n"
+    "Spending Consistency: [integer 0-20]\n"
+    "Emergency Fund: [integer 0-10]\n"
+    "RECOMMENDATIONS:\n"
+    "1. [First recommendation]\n"
+    "2. [Second recommendation]\n"
+    "3. [Third recommendation]\n"
+    "4. [Fourth recommendation]\n\n"
+    "Be strict with the format. No markdown. NO DECIMALS - only whole numbers!"
+)
 
 
 @router.post("/healthScore")
-async def healthScore(request: ChatRequest):
+async def healthScore(
+    request: HealthScoreRequest,
+    client=Depends(getGeminiClient),
+    cache=Depends(getResponseCache),
+    bypass_cache: bool = Depends(cacheBypassed),
+):
     """Evaluate the user's financial health score based on their financial summary.
 
     Provides a score out of 100 along with brief reasoning and 4-5 actionable recommendations.
-    Returns structured JSON with score, breakdown, and recommendations.
+    Returns structured JSON with score, breakdown, and recommendations. Parsed results are
+    cached per summary unless the client sends `Cache-Control: no-cache`.
+
+    When `transactions` are sent instead of a free-text `message`, the four sub-scores are
+    computed locally (see `services/healthScoreEngine.py`) and the response has the same fields.
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY is not configured")
-
-    client = genai.Client(api_key=api_key)
-
-    system_instruction = (
-        "SYSTEM: You are a Financial Health Evaluator. You will receive raw financial data "
-        "(budget, transactions, expenses, savings). You must analyze this data and CALCULATE "
-        "a financial health score (0-100) and a score breakdown.\n\n"
-        "SCORING CRITERIA (Total 100):\n"
-        "1. Budget Adherence (Max 40): Do they stay within budget?\n"
-        "2. Savings Rate (Max 30): Are they saving money? (Income vs Expense)\n"
-        "3. Spending Consistency (Max 20): Is spending predictable?\n"
-        "4. Emergency Fund (Max 10): Do they have savings buffer?\n\n"
-        "CRITICAL SCORING RULES:\n"
-        "- ALL scores MUST be WHOLE NUMBERS (integers) between 0 and 100\n"
-        "- NO decimal points allowed (e.g., use 27, NOT 27.5 or 27.63)\n"
-        "- Total SCORE must be between 0-100 (sum of breakdown scores)\n"
-        "- Budget Adherence: integer between 0-40\n"
-        "- Savings Rate: integer between 0-30\n"
-        "- Spending Consistency: integer between 0-20\n"
-        "- Emergency Fund: integer between 0-10\n\n"
-        "You MUST respond in EXACTLY this format:\n\n"
-        "SCORE: [integer from 0-100]\n"
-        "BREAKDOWN:\n"
-        "Budget Adherence: [integer 0-40]\n"
-        "Savings Rate: [integer 0-30]\n"
-        "Spending Consistency: [integer 0-20]\n"
-        "Emergency Fund: [integer 0-10]\n"
-        "RECOMMENDATIONS:\n"
-        "1. [First recommendation]\n"
-        "2. [Second recommendation]\n"
-        "3. [Third recommendation]\n"
-        "4. [Fourth recommendation]\n\n"
-        "Be strict with the format. No markdown. NO DECIMALS - only whole numbers!"
-    )
+    return await healthScoreResult(request, client, cache, bypass_cache)
 
-    full_prompt = f"{system_instruction}\n\nUSER DATA:\n{request.message}"
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=full_prompt
-        )
-        response_text = response.text
-        print("Health Score Response:", response_text)
-
-        # Parse the response
-        score = 0
-        budget_score = 0
-        savings_score = 0
-        consistency_score = 0
-        emergency_score = 0
-        recommendations = ""
-
-        lines = response_text.strip().split('\n')
-        current_section = None
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            if line.startswith("SCORE:"):
-                try:
-                    score = int(''.join(filter(str.isdigit, line.split(":")[1])))
+async def healthScoreResult(request: HealthScoreRequest, client, cache, bypass_cache: bool) -> dict:
+    """Score one request, locally or with the model; shared by `/healthScore` and its batch variant."""
+    if request.transactions is not None:
+        return await localHealthScore(request, client, cache, bypass_cache)
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Either message or transactions must be provided")
+
+    cache_key = cache.makeKey("healthScore", GEMINI_MODEL, HEALTH_SCORE_SYSTEM_INSTRUCTION, request.message)
+    cached = None if bypass_cache else cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    full_prompt = f"{HEALTH_SCORE_SYSTEM_INSTRUCTION}\n\nUSER DATA:\n{request.message}"
+
+    response_text = await generateContent(client, full_prompt, label="Gemini health score call")
+    logger.debug("health score response", extra={"responseChars": len(response_text), "response": response_text})
+
+    with timeStage("parse_response"):
+        try:
+            result = parseHealthScoreResponse(response_text)
+        except Exception as e:
+            logger.exception("health score response could not be parsed")
+            raise HTTPException(status_code=502, detail=f"Gemini health score call failed: {e}")
+    cache.set(cache_key, result)
+    return result
+
+
+def parseHealthScoreResponse(response_text: str) -> dict:
+    """Parse the SCORE/BREAKDOWN/RECOMMENDATIONS reply, clamping each score to its range."""
+    # Parse the response
+    score = 0
+    budget_score = 0
+    savings_score = 0
+    consistency_score = 0
+    emergency_score = 0
+    recommendations = ""
+
+    lines = response_text.strip().split('\n')
+    current_section = None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith("SCORE:"):
+            try:
+                score = int(''.join(filter(str.isdigit, line.split(":")[1])))
+            except: pass
+        elif line.startswith("BREAKDOWN:"):
+            current_section = "BREAKDOWN"
+        elif line.startswith("RECOMMENDATIONS:"):
+            current_section = "RECOMMENDATIONS"
+            continue # Skip the header line
+
+        if current_section == "BREAKDOWN":
+            if "Budget Adherence:" in line:
+                try: budget_score = int(''.join(filter(str.isdigit, line.split(":")[1])))
                 except: pass
-            elif line.startswith("BREAKDOWN:"):
-                current_section = "BREAKDOWN"
-            elif line.startswith("RECOMMENDATIONS:"):
-                current_section = "RECOMMENDATIONS"
-                continue # Skip the header line
-
-            if current_section == "BREAKDOWN":
-                if "Budget Adherence:" in line:
-                    try: budget_score = int(''.join(filter(str.isdigit, line.split(":")[1])))
-                    except: pass
-                elif "Savings Rate:" in line:
-                    try: savings_score = int(''.join(filter(str.isdigit, line.split(":")[1])))
-                    except: pass
-                elif "Spending Consistency:" in line:
-                    try: consistency_score = int(''.join(filter(str.isdigit, line.split(":")[1])))
-                    except: pass
-                elif "Emergency Fund:" in line:
-                    try: emergency_score = int(''.join(filter(str.isdigit, line.split(":")[1])))
-                    except: pass
-            
-            elif current_section == "RECOMMENDATIONS":
-                recommendations += line + "\n"
-
-        # Clamp scores to their valid ranges to ensure they stay within bounds
-        score = max(0, min(100, score))
-        budget_score = max(0, min(40, budget_score))
-        savings_score = max(0, min(30, savings_score))
-        consistency_score = max(0, min(20, consistency_score))
-        emergency_score = max(0, min(10, emergency_score))
-
-        return {
-            "score": score,
-            "budgetAdherenceScore": budget_score,
-            "savingsRateScore": savings_score,
-            "spendingConsistencyScore": consistency_score,
-            "emergencyFundScore": emergency_score,
-            "recommendations": recommendations.strip(),
-            "message": response_text
-        }
-    except Exception as e:
-        print(f"Error in healthScore: {e}")
-        raise HTTPException(status_code=502, detail=f"Gemini health score call failed: {e}")
+            elif "Savings Rate:" in line:
+                try: savings_score = int(''.join(filter(str.isdigit, line.split(":")[1])))
+                except: pass
+            elif "Spending Consistency:" in line:
+                try: consistency_score = int(''.join(filter(str.isdigit, line.split(":")[1])))
+                except: pass
+            elif "Emergency Fund:" in line:
+                try: emergency_score = int(''.join(filter(str.isdigit, line.split(":")[1])))
+                except: pass
+        
+        elif current_section == "RECOMMENDATIONS":
+            recommendations += line + "\n"
 
+    # Clamp scores to their valid ranges to ensure they stay within bounds
+    score = max(0, min(100, score))
+    budget_score = max(0, min(40, budget_score))
+    savings_score = max(0, min(30, savings_score))
+    consistency_score = max(0, min(20, consistency_score))
+    emergency_score = max(0, min(10, emergency_score))
 
-@router.post("/importCSV")
-async def importCSV(file: UploadFile = File(...)):
-    """Import and validate CSV file containing transaction data.
-    
-    Validates that the CSV has required columns: Transaction Name, Amount, 
-    Transaction Type, Date, Description, and Payment method.
-    Uses AI to verify data quality and filter out irrelevant rows.
-    Returns an array of validated transaction objects.
+    return {
+        "score": score,
+        "budgetAdherenceScore": budget_score,
+        "savingsRateScore": savings_score,
+        "spendingConsistencyScore": consistency_score,
+        "emergencyFundScore": emergency_score,
+        "recommendations": recommendations.strip(),
+        "message": response_text
+    }
+
+
+class InsightsBatchItem(BaseModel):
+    # Echoed back so the caller can match results, e.g. a user id or a month
+    id: Optional[str] = None
+    message: str
+
+
+class InsightsBatchRequest(BaseModel):
+    items: List[InsightsBatchItem]
+    concurrency: Optional[int] = None
+
+
+class HealthScoreBatchItem(HealthScoreRequest):
+    id: Optional[str] = None
+
+
+class HealthScoreBatchRequest(BaseModel):
+    items: List[HealthScoreBatchItem]
+    concurrency: Optional[int] = None
+
+
+def batchResponse(items: list, worker, concurrency: Optional[int]) -> StreamingResponse:
+    """Stream one NDJSON `result` or `error` event per item as it completes, then a `summary` event.
+
+    Items run with bounded parallelism (see `services/batch.py`) and every model call still
+    goes through the admission limiter, so a batch can't starve interactive requests. An
+    item that fails (bad input, model error, queue full) is reported with its own status and
+    the rest of the batch carries on. The request deadline applies to each item, so a long
+    batch keeps going past it.
     """
-    # Read the uploaded file
-    raw = await file.read()
-    filename = getattr(file, "filename", "unknown")
-    
-    # Only accept CSV files
-    if not filename.lower().endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Only CSV files are supported for import")
-    
-    # Parse CSV content
-    try:
-        decoded = raw.decode('utf-8', errors='replace')
-        stream = io.StringIO(decoded)
-        reader = csv.DictReader(stream)
-        
-        # Get the fieldnames (column headers)
-        fieldnames = reader.fieldnames
-        if not fieldnames:
-            raise HTTPException(status_code=400, detail="CSV file is empty or has no headers")
-        
-        # Read all rows
-        rows = list(reader)
-        if not rows:
-            raise HTTPException(status_code=400, detail="CSV file contains no data rows")
-            
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to parse CSV file: {str(e)}")
-    
-    # Get Gemini API key
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY is not configured")
-    
-    client = genai.Client(api_key=api_key)
-    
-    # Prepare CSV data for AI analysis
-    # Limit to first 100 rows to avoid token limits
-    sample_rows = rows[:100]
-    csv_preview = f"Column Headers: {', '.join(fieldnames)}\n\n"
-    csv_preview += "Sample Rows (first 10):\n"
-    for i, row in enumerate(sample_rows[:10]):
-        csv_preview += f"Row {i+1}: {row}\n"
-    
-    # System prompt for AI validation
-    system_instruction = (
-        "SYSTEM: You are a Transaction Data Validator. Your job is to analyze CSV files "
-        "containing financial transaction data and validate their structure and content.\n\n"
-        "REQUIRED COLUMNS (must be present, case-insensitive):\n"
-        "1. Transaction Name (or similar: name, transaction, description)\n"
-        "2. Amount (or similar: price, cost, value)\n"
-        "3. Transaction Type (or similar: type, category) - should contain 'Expense' or 'Income'\n"
-        "4. Date (or similar: transaction date, date)\n"
-        "5. Description (or similar: notes, memo, details)\n"
-        "6. Payment Method (or similar: payment, method, payment type)\n\n"
-        "VALIDATION RULES:\n"
-        "1. Check if the CSV has columns that match the required columns (fuzzy matching allowed)\n"
-        "2. Verify that the data is about financial transactions (expenses, income, purchases, etc.)\n"
-        "3. Check if rows contain relevant transaction data, not random/irrelevant information\n"
-        "4. Identify which columns map to the required fields\n\n"
-        "RESPOND IN THIS EXACT FORMAT:\n"
-        "STATUS: [VALID or INVALID or IRRELEVANT]\n"
-        "REASON: [Brief explanation]\n"
-        "COLUMN_MAPPING:\n"
-        "Transaction Name: [actual column name or MISSING]\n"
-        "Amount: [actual column name or MISSING]\n"
-        "Transaction Type: [actual column name or MISSING]\n"
-        "Date: [actual column name or MISSING]\n"
-        "Description: [actual column name or MISSING]\n"
-        "Payment Method: [actual column name or MISSING]\n\n"
-        "Use STATUS: VALID only if all required columns are present (with fuzzy matching).\n"
-        "Use STATUS: INVALID if required columns are missing.\n"
-        "Use STATUS: IRRELEVANT if the data is not about financial transactions."
+    checkBatchSize(items)
+    limit = batchConcurrency(concurrency)
+
+    async def runItem(item):
+        # Each item gets the request's deadline budget from when it starts, not from when the batch did
+        with itemDeadline():
+            return await worker(item)
+
+    async def ndjsonLines():
+        started = time.perf_counter()
+        failed = 0
+        results = runBounded(items, runItem, limit)
+        try:
+            async for index, result, error in results:
+                meta = {"index": index, "id": items[index].id}
+                if error is None:
+                    yield encodeEvent("result", {**meta, "result": result}, "ndjson")
+                else:
+                    failed += 1
+                    yield encodeEvent("error", {**meta, **itemError(error)}, "ndjson")
+            yield encodeEvent(
+                "summary",
+                {
+                    "total": len(items),
+                    "succeeded": len(items) - failed,
+                    "failed": failed,
+                    "concurrency": limit,
+                    "totalMs": round((time.perf_counter() - started) * 1000, 1),
+                },
+                "ndjson",
+            )
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(ndjsonLines(), media_type="application/x-ndjson")
+
+
+@router.post("/insights/batch")
+async def insightsBatch(
+    request: InsightsBatchRequest,
+    client=Depends(getGeminiClient),
+    cache=Depends(getResponseCache),
+    bypass_cache: bool = Depends(cacheBypassed),
+):
+    """Generate insights for many summaries (e.g. every user, or every month) in one request.
+
+    Results stream back as NDJSON in completion order, each tagged with the item's `index`
+    and `id`. Each item is answered exactly as `/insights` would, cache included.
+    """
+    return batchResponse(
+        request.items,
+        lambda item: insightsResult(item.message, client, cache, bypass_cache),
+        request.concurrency,
     )
-    
-    validation_prompt = f"{system_instruction}\n\nAnalyze this CSV:\n\n{csv_preview}"
-    
-    # Call AI to validate CSV structure
-    try:
-        validation_response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=validation_prompt
-        )
-        validation_text = validation_response.text
-        print("Validation Response:", validation_text)
-        
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"AI validation failed: {str(e)}")
-    
-    # Parse validation response
+
+
+@router.post("/healthScore/batch")
+async def healthScoreBatch(
+    request: HealthScoreBatchRequest,
+    client=Depends(getGeminiClient),
+    cache=Depends(getResponseCache),
+    bypass_cache: bool = Depends(cacheBypassed),
+):
+    """Score many users or months in one request; each item is scored as `/healthScore` would.
+
+    Items may mix free-text `message` and structured `transactions` input. Results stream
+    back as NDJSON in completion order, tagged with the item's `index` and `id`.
+    """
+    return batchResponse(
+        request.items,
+        # Without the id, so cached scores are shared with `/healthScore`
+        lambda item: healthScoreResult(
+            HealthScoreRequest(**item.model_dump(exclude={"id"})), client, cache, bypass_cache
+        ),
+        request.concurrency,
+    )
+
+
+# System prompt for AI validation
+CSV_VALIDATION_INSTRUCTION = (
+    "SYSTEM: You are a Transaction Data Validator. Your job is to analyze CSV files "
+    "containing financial transaction data and validate their structure and content.\n\n"
+    "REQUIRED COLUMNS (must be present, case-insensitive):\n"
+    "1. Transaction Name (or similar: name, transaction, description)\n"
+    "2. Amount (or similar: price, cost, value)\n"
+    "3. Transaction Type (or similar: type, category) - should contain 'Expense' or 'Income'\n"
+    "4. Date (or similar: transaction date, date)\n"
+    "5. Description (or similar: notes, memo, details)\n"
+    "6. Payment Method (or similar: payment, method, payment type)\n\n"
+    "VALIDATION RULES:\n"
+    "1. Check if the CSV has columns that match the required columns (fuzzy matching allowed)\n"
+    "2. Verify that the data is about financial transactions (expenses, income, purchases, etc.)\n"
+    "3. Check if rows contain relevant transaction data, not random/irrelevant information\n"
+    "4. Identify which columns map to the required fields\n\n"
+    "RESPOND IN THIS EXACT FORMAT:\n"
+    "STATUS: [VALID or INVALID or IRRELEVANT]\n"
+    "REASON: [Brief explanation]\n"
+    "COLUMN_MAPPING:\n"
+    "Transaction Name: [actual column name or MISSING]\n"
+    "Amount: [actual column name or MISSING]\n"
+    "Transaction Type: [actual column name or MISSING]\n"
+    "Date: [actual column name or MISSING]\n"
+    "Description: [actual column name or MISSING]\n"
+    "Payment Method: [actual column name or MISSING]\n\n"
+    "Use STATUS: VALID only if all required columns are present (with fuzzy matching).\n"
+    "Use STATUS: INVALID if required columns are missing.\n"
+    "Use STATUS: IRRELEVANT if the data is not about financial transactions."
+)
+
+
+def parseValidationResponse(validation_text: str) -> tuple:
+    """Parse the validator's STATUS/REASON/COLUMN_MAPPING reply into (status, reason, mapping)."""
     lines = validation_text.strip().split('\n')
     status = None
     reason = None
@@ -454,6 +752,34 @@ async def importCSV(file: UploadFile = File(...)):
             value = parts[1].strip()
             if value != "MISSING":
                 column_mapping[key] = value
+
+    return status, reason, column_mapping
+
+
+async def validateCsvWithModel(fieldnames: List[str], preview: List[dict], client, mappings) -> dict:
+    """Ask Gemini to validate the CSV and map its columns; raises HTTPException (400) if unusable.
+
+    VALID mappings are remembered so the same header layout never needs the model again.
+    """
+    # Prepare CSV data for AI analysis
+    with timeStage("prompt_build"):
+        csv_preview = f"Column Headers: {', '.join(fieldnames)}\n\n"
+        csv_preview += "Sample Rows (first 10):\n"
+        for i, row in enumerate(preview[:10]):
+            csv_preview += f"Row {i+1}: {row}\n"
+
+        validation_prompt = f"{CSV_VALIDATION_INSTRUCTION}\n\nAnalyze this CSV:\n\n{csv_preview}"
+    
+    # Call AI to validate CSV structure
+    validation_text = await generateContent(client, validation_prompt, label="AI validation")
+    logger.debug("csv validation response", extra={"responseChars": len(validation_text), "response": validation_text})
+
+    with timeStage("parse_response"):
+        status, reason, column_mapping = parseValidationResponse(validation_text)
+
+    # The model sometimes changes the case/spacing of header names; map back to the real ones
+    by_normalized = {normalizeHeader(name): name for name in fieldnames}
+    column_mapping = {field: by_normalized.get(normalizeHeader(header), header) for field, header in column_mapping.items()}
     
     # Check validation status
     if status == "IRRELEVANT":
@@ -472,57 +798,300 @@ async def importCSV(file: UploadFile = File(...)):
             status_code=400,
             detail=f"CSV file must have the following columns: {', '.join(required_cols)}. Missing: {', '.join(missing) if missing else 'columns not found'}"
         )
+
+    if status == "VALID":
+        mappings.remember(fieldnames, column_mapping)
+    return column_mapping
+
+
+NO_VALID_TRANSACTIONS = (
+    "No valid transactions found in CSV. Ensure rows have Transaction Name, Amount, Transaction Type, "
+    "and Date filled with a readable amount, date and type."
+)
+
+
+def noValidTransactions(counts: dict) -> HTTPException:
+    errors = counts.get("rowErrors")
+    detail = NO_VALID_TRANSACTIONS
+    if errors:
+        detail += f" Row {errors[0]['row']}: {errors[0]['reason']}."
+    return HTTPException(status_code=400, detail=detail)
+
+
+# Import response layouts: the transactions as a list of objects, or as parallel arrays per field
+IMPORT_LAYOUTS = {
+    "rows": lambda transactions: {"transactions": transactions},
+    "columns": lambda transactions: {"columns": toColumns(transactions)},
+}
+
+
+@router.post("/importCSV")
+async def importCSV(
+    file: UploadFile = File(...),
+    user_id: Optional[str] = Form(None),
+    format: str = "json",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    layout: str = "rows",
+    client=Depends(getGeminiClient),
+    mappings=Depends(getColumnMappingStore),
+    index=Depends(getTransactionIndex),
+):
+    """Import and validate CSV file containing transaction data.
     
-    # Process and filter rows
-    valid_transactions = []
-    skipped_count = 0
+    Validates that the CSV has required columns: Transaction Name, Amount, 
+    Transaction Type, Date, Description, and Payment method.
+    Uses AI to verify data quality and filter out irrelevant rows.
+    Returns an array of validated transaction objects.
+
+    Header layouts seen before, or matched locally with high confidence, skip the AI
+    validation call (see `services/columnMapping.py`).
+
+    The upload is decoded incrementally and only the first rows are buffered for
+    validation. With `?format=ndjson` the transactions are streamed back in pages of
+    `batch_size` (one JSON line each) followed by a summary line, so memory stays flat
+    regardless of file size.
+
+    Rows are normalized in column batches: each transaction gains `amountCents`, `isoDate`
+    (the file's date format is inferred once) and `normalizedType` ("expense"/"income", or null
+    when the type text and the amount's sign don't decide it).
+    Rows that fail are skipped and listed in `rowErrors` with their row number and reason.
+
+    With a `user_id`, transactions that user already imported (from this or an overlapping
+    earlier file) are left out and counted in `duplicateRows`, so re-uploads are idempotent.
+    The rows count as imported once the client confirms the returned `importToken`.
+
+    With `?layout=columns` the transactions are sent as `columns` (one array per field)
+    instead of a `transactions` list of objects that repeat every key.
+    """
+    filename = getattr(file, "filename", "unknown") or "unknown"
     
-    for row in rows:
-        # Extract values using column mapping
-        try:
-            transaction_name = row.get(column_mapping.get("Transaction Name", ""), "").strip()
-            amount = row.get(column_mapping.get("Amount", ""), "").strip()
-            transaction_type = row.get(column_mapping.get("Transaction Type", ""), "").strip()
-            date = row.get(column_mapping.get("Date", ""), "").strip()
-            description = row.get(column_mapping.get("Description", ""), "").strip()
-            payment_method = row.get(column_mapping.get("Payment Method", ""), "").strip()
-            
-            # Validate required fields are not empty
-            if not transaction_name or not amount or not transaction_type or not date:
-                skipped_count += 1
-                continue
-            
-            # Build transaction object
-            transaction = {
-                "transactionName": transaction_name,
-                "amount": amount,
-                "transactionType": transaction_type,
-                "date": date,
-                "description": description,
-                "paymentMethod": payment_method
-            }
-            
-            valid_transactions.append(transaction)
-            
-        except Exception as e:
-            # Skip rows that cause errors
-            skipped_count += 1
-            continue
+    # Only accept CSV files
+    if not filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported for import")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    if layout not in IMPORT_LAYOUTS:
+        raise HTTPException(status_code=400, detail="layout must be 'rows' or 'columns'")
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be at least 1")
     
-    if not valid_transactions:
-        raise HTTPException(
-            status_code=400,
-            detail="No valid transactions found in CSV. Ensure rows have Transaction Name, Amount, Transaction Type, and Date filled."
-        )
+    csv_stream, column_mapping = await openCsvImport(file.file, client, mappings)
+
+    # Normalize and filter rows a batch at a time as they stream out of the file
+    counts = {"totalRows": 0, "skippedRows": 0}
+    batches = iterNormalizedBatches(csv_stream, column_mapping, counts, batch_size)
+    if user_id:
+        batches = index.newOnly(user_id, batches, counts)
+
+    if format == "ndjson":
+        def ndjsonLines():
+            try:
+                for batch in batches:
+                    yield encodeEvent("transactions", IMPORT_LAYOUTS[layout](batch), "ndjson")
+                valid_count = counts["totalRows"] - counts["skippedRows"] - counts.get("duplicateRows", 0)
+                yield encodeEvent("summary", importSummary(valid_count, counts), "ndjson")
+            except csv.Error as e:
+                yield encodeEvent("error", {"status": 400, "detail": f"Failed to parse CSV file: {e}"}, "ndjson")
+            finally:
+                csv_stream.close()
+
+        return StreamingResponse(ndjsonLines(), media_type="application/x-ndjson")
+
+    try:
+        valid_transactions = await run_in_threadpool(list, itertools.chain.from_iterable(batches))
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Failed to parse CSV file: {str(e)}")
+    finally:
+        csv_stream.close()
     
-    return {
-        "success": True,
-        "message": f"Successfully imported {len(valid_transactions)} transactions. Skipped {skipped_count} invalid rows.",
-        "transactions": valid_transactions,
-        "totalRows": len(rows),
-        "validRows": len(valid_transactions),
-        "skippedRows": skipped_count
+    if not valid_transactions and not counts.get("duplicateRows"):
+        raise noValidTransactions(counts)
+
+    # Returned as a response so FastAPI doesn't walk every transaction with jsonable_encoder first
+    return TimedJSONResponse({**importSummary(len(valid_transactions), counts), **IMPORT_LAYOUTS[layout](valid_transactions)})
+
+
+async def openCsvImport(fileobj, client, mappings) -> tuple:
+    """Read the CSV header and preview rows and resolve the column mapping.
+
+    Returns (csv_stream, column_mapping); the rest of the file is read lazily from
+    `csv_stream.rows()`, and the caller closes the stream.
+    """
+    # Parse the header and the preview rows; the rest of the file is read lazily
+    try:
+        with timeStage("upload_read"):
+            csv_stream = CsvStream(fileobj)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to parse CSV file: {str(e)}")
+
+    fieldnames = csv_stream.fieldnames
+    if not fieldnames:
+        csv_stream.close()
+        raise HTTPException(status_code=400, detail="CSV file is empty or has no headers")
+    if not csv_stream.preview:
+        csv_stream.close()
+        raise HTTPException(status_code=400, detail="CSV file contains no data rows")
+    
+    # Known header layouts and confident local matches skip the validation model call
+    with timeStage("column_mapping"):
+        column_mapping = mappings.resolve(fieldnames, csv_stream.preview)
+    if column_mapping is None:
+        try:
+            column_mapping = await validateCsvWithModel(fieldnames, csv_stream.preview, client, mappings)
+        except HTTPException:
+            csv_stream.close()
+            raise
+    return csv_stream, column_mapping
+
+
+def importSummary(valid_count: int, counts: dict) -> dict:
+    """Result fields shared by the JSON and NDJSON import responses."""
+    duplicates = counts.get("duplicateRows", 0)
+    details = {
+        "totalRows": counts["totalRows"],
+        "validRows": valid_count,
+        "skippedRows": counts["skippedRows"],
+        "duplicateRows": duplicates,
+        "amountFormat": counts.get("amountFormat"),
+        "dateFormat": counts.get("dateFormat"),
+        "rowErrors": counts.get("rowErrors", []),
     }
+    if "importToken" in counts:
+        # Confirm it with POST /importIndex/{user_id}/confirm once the rows are stored
+        details["importToken"] = counts["importToken"]
+    if not valid_count and not duplicates:
+        return {"success": False, "message": NO_VALID_TRANSACTIONS, **details}
+    message = f"Successfully imported {valid_count} transactions. Skipped {counts['skippedRows']} invalid rows."
+    if duplicates:
+        message += f" {duplicates} rows were already imported."
+    return {"success": True, "message": message, **details}
+
+
+class ImportConfirmation(BaseModel):
+    importToken: str
+
+
+@router.post("/importIndex/{user_id}/confirm")
+async def confirmImport(user_id: str, confirmation: ImportConfirmation, index=Depends(getTransactionIndex)):
+    """Mark the rows of an import as stored by the client, so re-uploads skip them from now on.
+
+    Until then (or if the token expires) uploading the same file returns the same rows again.
+    """
+    recorded = await run_in_threadpool(index.confirm, user_id, confirmation.importToken)
+    if recorded is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired importToken")
+    return {"success": True, "userId": user_id, "recordedRows": recorded}
+
+
+@router.delete("/importIndex/{user_id}")
+async def forgetImports(user_id: str, index=Depends(getTransactionIndex)):
+    """Forget which transactions a user imported, e.g. after they cleared their data in the app."""
+    index.forget(user_id)
+    return {"success": True, "userId": user_id}
+
 
+# Background jobs: submit an upload, get a job ID at once, then poll for progress and the result
+def _jobView(http_request: Request, job) -> dict:
+    return {**job.view(), "statusUrl": http_request.url_for("getJob", job_id=job.id).path}
 
 
+@router.post("/jobs/processFile", status_code=202)
+async def submitProcessFileJob(
+    http_request: Request,
+    file: UploadFile = File(...),
+    user_question: Optional[str] = Form(None),
+    mode: str = Form("compact"),
+    jobs=Depends(getJobQueue),
+):
+    """Queue a `/processFile` run and return its job ID immediately.
+
+    Poll `GET /jobs/{job_id}` for `stage`/`progress`; the finished job's `result` is the
+    `/processFile` response. Submitting the same file and question again returns the
+    existing job instead of redoing the work.
+    """
+    checkFileMode(mode)
+    filename = getattr(file, "filename", "unknown") or "unknown"
+    if not filename.lower().endswith((".pdf", ".csv")):
+        raise HTTPException(status_code=400, detail="Unsupported file type. Only PDF and CSV are supported.")
+    with timeStage("upload_read"):
+        raw = await file.read()
+    job, _ = jobs.submit("processFile", {"filename": filename, "userQuestion": user_question, "mode": mode}, raw)
+    return _jobView(http_request, job)
+
+
+@router.post("/jobs/importCSV", status_code=202)
+async def submitImportJob(
+    http_request: Request,
+    file: UploadFile = File(...),
+    user_id: Optional[str] = Form(None),
+    jobs=Depends(getJobQueue),
+):
+    """Queue an `/importCSV` run; the finished job's `result` is the `/importCSV` JSON response."""
+    filename = getattr(file, "filename", "unknown") or "unknown"
+    if not filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported for import")
+    with timeStage("upload_read"):
+        raw = await file.read()
+    job, _ = jobs.submit("importCSV", {"filename": filename, "userId": user_id}, raw)
+    return _jobView(http_request, job)
+
+
+@router.get("/jobs/{job_id}")
+async def getJob(job_id: str, http_request: Request, jobs=Depends(getJobQueue)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job ID")
+    return _jobView(http_request, job)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancelJob(job_id: str, http_request: Request, jobs=Depends(getJobQueue)):
+    """Cancel a queued or running job. Finished jobs are returned unchanged."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job ID")
+    return _jobView(http_request, job)
+
+
+def jobHandlers(app) -> dict:
+    """Job kind -> coroutine running it, bound to the app's shared client and stores."""
+
+    async def runProcessFile(job) -> dict:
+        client = app.state.gemini_client
+        job.report("extracting", 0.1)
+        document_id, first_text = await summarizeDocument(
+            job.payload, job.params["filename"], client, app.state.document_store, job.params["mode"]
+        )
+        if FILE_REFUSAL in first_text:
+            return {"message": first_text, "documentId": document_id}
+        job.report("answering", 0.6)
+        answer_prompt = buildAnswerPrompt(first_text, job.params["userQuestion"])
+        second_text = await generateContent(client, answer_prompt, label="Gemini answer call")
+        return {"message": second_text, "documentId": document_id}
+
+    async def runImport(job) -> dict:
+        job.report("validating", 0.0)
+        size = len(job.payload) or 1
+        fileobj = io.BytesIO(job.payload)
+        csv_stream, column_mapping = await openCsvImport(fileobj, app.state.gemini_client, app.state.column_mappings)
+        counts = {"totalRows": 0, "skippedRows": 0}
+        batches = iterNormalizedBatches(csv_stream, column_mapping, counts, DEFAULT_BATCH_SIZE)
+        if job.params.get("userId"):
+            batches = app.state.transaction_index.newOnly(job.params["userId"], batches, counts)
+        valid_transactions = []
+        try:
+            while True:
+                batch = await run_in_threadpool(next, batches, None)
+                if batch is None:
+                    break
+                valid_transactions.extend(batch)
+                job.report("importing", fileobj.tell() / size)
+        except csv.Error as e:
+            raise HTTPException(status_code=400, detail=f"Failed to parse CSV file: {str(e)}")
+        finally:
+            csv_stream.close()
+        if not valid_transactions and not counts.get("duplicateRows"):
+            raise noValidTransactions(counts)
+        return {**importSummary(len(valid_transactions), counts), "transactions": valid_transactions}
+
+    return {"processFile": runProcessFile, "importCSV": runImport}
@@ -0,0 +1,135 @@
+"""Multi-worker launcher: preload the app once, then fork uvicorn workers sharing one socket.
+
+Run from the server directory:
+
+    python serve.py --workers 4 --port 8000
+
+The parent imports the app and its heavy dependencies (google-genai, PyPDF2, numpy) before
+forking, so workers start without importing anything and share those pages copy-on-write.
+Each worker runs the lifespan hook itself, so the Gemini client and its connection pool,
+the stores and the PDF process pool are created per worker, after the fork. Workers that
+die are replaced; SIGINT/SIGTERM are forwarded for a graceful shutdown.
+
+With one worker (the default off Linux/macOS, where fork is unavailable) this is the same
+as `uvicorn main:app`.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+from dotenv import load_dotenv
+
+logger = logging.getLogger("serve")
+
+# A worker that exits sooner than this after starting is restarted only after a pause
+MIN_WORKER_UPTIME_SECONDS = 5.0
+
+
+def preload():
+    """Import the app and warm the dependencies its lifespan hook and endpoints import lazily."""
+    import main
+    from services.pdfExtract import pdfReaderClass
+
+    try:
+        from google import genai  # noqa: F401
+    except Exception:
+        pass
+    pdfReaderClass()
+    return main.app
+
+
+def bindSocket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def spawnWorker(app, sock: socket.socket, args, number: int) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # Child: uvicorn installs its own signal handlers once it starts
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Only the first worker re-queues jobs interrupted by a restart (see services/jobQueue.py)
+    os.environ["JOB_REQUEUE_ON_START"] = "1" if number == 0 else "0"
+    code = 0
+    try:
+        config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException:
+        logger.exception("worker crashed", extra={"worker": number})
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def serve(args) -> None:
+    load_dotenv()
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        uvicorn.run("main:app", host=args.host, port=args.port, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+        return
+
+    # The web workers already spread requests over the cores; don't also give each one a
+    # full-size PDF process pool unless asked to
+    os.environ.setdefault("PDF_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+    app = preload()
+    sock = bindSocket(args.host, args.port)
+    logger.info("starting workers", extra={"workers": args.workers, "host": args.host, "port": args.port})
+
+    children = {}  # pid -> (worker number, start time)
+    spawned = 0
+    for _ in range(args.workers):
+        children[spawnWorker(app, sock, args, spawned)] = (spawned, time.monotonic())
+        spawned += 1
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        number, started = children.pop(pid, (None, 0.0))
+        if number is None or stopping:
+            continue
+        logger.warning("worker exited, restarting", extra={"worker": number, "status": status})
+        if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+            time.sleep(1.0)
+        children[spawnWorker(app, sock, args, spawned)] = (spawned, time.monotonic())
+        spawned += 1
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", 1)))
+    parser.add_argument("--keep-alive", type=int, default=5, help="idle keep-alive timeout in seconds")
+    parser.add_argument("--log-level", default="info")
+    serve(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
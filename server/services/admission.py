@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from services.metrics import recordStage
+
+# Concurrent model calls allowed per process; further calls wait in a bounded queue
+DEFAULT_MAX_CONCURRENT = 16
+DEFAULT_MAX_QUEUE = 64
+# Longest a call may wait for a slot before it is shed with a 503
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 10.0
+
+# Weight of the newest call in the moving average used for Retry-After
+_EWMA_WEIGHT = 0.2
+
+
+class AdmissionLimiter:
+    """Bounded concurrency with a bounded wait queue in front of the model.
+
+    `slot()` admits up to `max_concurrent` holders at once. Up to `max_queue` more wait
+    for a slot, for at most `queue_timeout` seconds. Anything beyond that is shed right
+    away with a 429 (queue full), and a wait that times out gets a 503. Both carry a
+    `Retry-After` estimated from the queue depth and recent call durations.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.avg_call_seconds = 1.0
+
+    @classmethod
+    def fromEnv(cls) -> "AdmissionLimiter":
+        return cls(
+            max_concurrent=int(os.getenv("MODEL_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT)),
+            max_queue=int(os.getenv("MODEL_MAX_QUEUE", DEFAULT_MAX_QUEUE)),
+            queue_timeout=float(os.getenv("MODEL_QUEUE_TIMEOUT_SECONDS", DEFAULT_QUEUE_TIMEOUT_SECONDS)),
+        )
+
+    def retryAfter(self) -> str:
+        # Time for the current queue to drain through the available slots
+        backlog = self.waiting + self.active
+        return str(max(1, math.ceil(backlog * self.avg_call_seconds / self.max_concurrent)))
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            self.shed_queue_full += 1
+            raise HTTPException(
+                status_code=429,
+                detail="The AI service is busy. Please retry shortly.",
+                headers={"Retry-After": self.retryAfter()},
+            )
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed_timeout += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"The AI service is busy; no capacity within {self.queue_timeout:g}s. Please retry shortly.",
+                headers={"Retry-After": self.retryAfter()},
+            )
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        waited = started - queued_at
+        recordStage("admission_wait", waited)
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            elapsed = time.perf_counter() - started
+            self.avg_call_seconds += _EWMA_WEIGHT * (elapsed - self.avg_call_seconds)
+
+    def hasFreeSlot(self) -> bool:
+        return self.active < self.max_concurrent and not self.waiting
+
+    def stats(self) -> dict:
+        return {
+            "maxConcurrent": self.max_concurrent,
+            "maxQueue": self.max_queue,
+            "active": self.active,
+            "queueDepth": self.waiting,
+            "admitted": self.admitted,
+            "shedQueueFull": self.shed_queue_full,
+            "shedTimeout": self.shed_timeout,
+            "avgWaitSeconds": round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+            "maxWaitSeconds": round(self.max_wait, 4),
+            "avgCallSeconds": round(self.avg_call_seconds, 4),
+        }
+
+
+class Singleflight:
+    """Coalesces concurrent identical calls into one.
+
+    The first caller for a key starts the call; callers arriving while it is in flight
+    await the same result (or exception). The call runs as its own task, so one caller
+    disconnecting doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def makeKey(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda finished: self._finish(key, finished))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # Mark the exception retrieved even if every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        requests = self.calls + self.coalesced
+        return {
+            "inFlight": len(self._inflight),
+            "upstreamCalls": self.calls,
+            "coalescedRequests": self.coalesced,
+            "coalescingRatio": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
+
+
+_limiter: Optional[AdmissionLimiter] = None
+_flights: Optional[Singleflight] = None
+
+
+def startAdmission() -> None:
+    """Create the process-wide limiter and singleflight group; called from the lifespan hook."""
+    global _limiter, _flights
+    _limiter = AdmissionLimiter.fromEnv()
+    _flights = Singleflight()
+
+
+def stopAdmission() -> None:
+    global _limiter, _flights
+    _limiter = None
+    _flights = None
+
+
+@asynccontextmanager
+async def modelSlot():
+    """Hold an admission slot for one model call (no limit when admission isn't started)."""
+    if _limiter is None:
+        yield
+        return
+    async with _limiter.slot():
+        yield
+
+
+def modelSlotFree() -> bool:
+    """Whether a model call would be admitted right now without queueing."""
+    return _limiter is None or _limiter.hasFreeSlot()
+
+
+async def coalesce(key: str, fn: Callable[[], Awaitable]):
+    """Run `fn()` once for all concurrent callers with the same key."""
+    if _flights is None:
+        return await fn()
+    return await _flights.do(key, fn)
+
+
+def admissionStats() -> dict:
+    return {
+        "limiter": _limiter.stats() if _limiter is not None else None,
+        "singleflight": _flights.stats() if _flights is not None else None,
+    }
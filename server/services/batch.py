@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Awaitable, Callable, List, Tuple, TypeVar
+
+from fastapi import HTTPException
+
+DEFAULT_BATCH_CONCURRENCY = 8
+DEFAULT_BATCH_MAX_CONCURRENCY = 32
+DEFAULT_BATCH_MAX_ITEMS = 500
+
+Item = TypeVar("Item")
+
+logger = logging.getLogger(__name__)
+
+
+def batchConcurrency(requested) -> int:
+    """Per-request parallelism: the request's value (or `BATCH_CONCURRENCY`), capped at `BATCH_MAX_CONCURRENCY`."""
+    default = int(os.getenv("BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY))
+    ceiling = int(os.getenv("BATCH_MAX_CONCURRENCY", DEFAULT_BATCH_MAX_CONCURRENCY))
+    return max(1, min(requested or default, ceiling))
+
+
+def checkBatchSize(items: list) -> None:
+    if not items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    max_items = int(os.getenv("BATCH_MAX_ITEMS", DEFAULT_BATCH_MAX_ITEMS))
+    if len(items) > max_items:
+        raise HTTPException(status_code=413, detail=f"At most {max_items} items per batch")
+
+
+def itemError(error: BaseException) -> dict:
+    """Status and detail reported for one failed batch item."""
+    if isinstance(error, HTTPException):
+        failure = {"status": error.status_code, "detail": error.detail}
+        if error.headers and "Retry-After" in error.headers:
+            failure["retryAfter"] = int(error.headers["Retry-After"])
+        return failure
+    logger.error("batch item failed", exc_info=error)
+    return {"status": 500, "detail": f"{type(error).__name__}: {error}"}
+
+
+async def runBounded(
+    items: List[Item], worker: Callable[[Item], Awaitable[dict]], concurrency: int
+) -> AsyncIterator[Tuple[int, dict, BaseException]]:
+    """Run `worker` over `items` with at most `concurrency` in flight, yielding in completion order.
+
+    Yields `(index, result, None)` or `(index, None, error)`; one item failing never stops
+    the others. Only `concurrency` tasks exist at a time, each pulling the next index when
+    it finishes one. Closing the generator (e.g. the client disconnected) cancels the rest.
+    """
+    finished: asyncio.Queue = asyncio.Queue()
+    pending = iter(range(len(items)))
+
+    async def drain():
+        for index in pending:
+            try:
+                finished.put_nowait((index, await worker(items[index]), None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                finished.put_nowait((index, None, e))
+
+    tasks = [asyncio.create_task(drain()) for _ in range(min(concurrency, len(items)))]
+    try:
+        for _ in range(len(items)):
+            yield await finished.get()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,184 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Set, Tuple
+
+from fastapi import HTTPException, Request
+
+from services.geminiClient import generateContent
+
+DEFAULT_WINDOW_TURNS = 6
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_TTL_SECONDS = 1800.0
+DEFAULT_SUMMARY_MAX_CHARS = 1200
+# Longer messages and replies are cut to this when kept in a session's history
+DEFAULT_MAX_TURN_CHARS = 2000
+
+SUMMARY_INSTRUCTION = (
+    "SYSTEM: You maintain the running summary of a conversation between a user and a"
+    " financial assistant. Merge the earlier summary and the new turns into one summary of at"
+    " most {max_chars} characters. Keep amounts, dates, goals, account details and decisions"
+    " the user mentioned; drop pleasantries. Reply with the summary text only."
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """Recent turns verbatim plus a rolling summary of everything older."""
+
+    def __init__(self, session_id: str, created: float):
+        self.id = session_id
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        self.turn_count = 0
+        self.created = created
+        self.updated = created
+        self.summarizing = False
+        # Turns of one session run one at a time so each sees the previous reply
+        self.lock = asyncio.Lock()
+
+
+class ChatSessionStore:
+    """Server-side chat sessions with a bounded prompt per turn and bounded memory.
+
+    A session keeps up to `2 * window_turns` recent turns verbatim. Once it holds that many,
+    the oldest `window_turns` are folded into the session's summary by one model call in
+    the background (or, if that call fails, by keeping the start of each user message), and
+    the summary is capped at `summary_max_chars`. The prompt for a turn is therefore the
+    system instruction, the summary and at most `2 * window_turns` turns of at most
+    `max_turn_chars` each, however long the conversation runs. Sessions idle for
+    `ttl_seconds` expire and the least recently used are evicted past `max_sessions`.
+    """
+
+    def __init__(
+        self,
+        window_turns: int = DEFAULT_WINDOW_TURNS,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        summary_max_chars: int = DEFAULT_SUMMARY_MAX_CHARS,
+        max_turn_chars: int = DEFAULT_MAX_TURN_CHARS,
+    ):
+        self.window_turns = max(1, window_turns)
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.summary_max_chars = summary_max_chars
+        self.max_turn_chars = max_turn_chars
+        self.created = 0
+        self.expired = 0
+        self.evictions = 0
+        self.summaries = 0
+        self.summary_failures = 0
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @classmethod
+    def fromEnv(cls) -> "ChatSessionStore":
+        return cls(
+            window_turns=int(os.getenv("CHAT_WINDOW_TURNS", DEFAULT_WINDOW_TURNS)),
+            max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", DEFAULT_MAX_SESSIONS)),
+            ttl_seconds=float(os.getenv("CHAT_SESSION_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            summary_max_chars=int(os.getenv("CHAT_SUMMARY_MAX_CHARS", DEFAULT_SUMMARY_MAX_CHARS)),
+        )
+
+    def create(self) -> ChatSession:
+        self._purge()
+        session = ChatSession(uuid.uuid4().hex, time.time())
+        self._sessions[session.id] = session
+        self.created += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        self._purge()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def require(self, session_id: str) -> ChatSession:
+        session = self.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired sessionId. Start a new chat session.")
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def buildPrompt(self, session: ChatSession, system_instruction: str, message: str) -> str:
+        parts = [system_instruction]
+        if session.summary:
+            parts.append(f"Summary of the earlier conversation:\n{session.summary}")
+        if session.turns:
+            parts.append("\n".join(f"User: {user}\nAssistant: {reply}" for user, reply in session.turns))
+        parts.append(f"User: {message}")
+        return "\n\n".join(parts)
+
+    def record(self, session: ChatSession, message: str, reply: str, client) -> None:
+        """Append a finished turn and, when the history is full, start folding the oldest turns into the summary."""
+        session.turns.append((message[:self.max_turn_chars], reply[:self.max_turn_chars]))
+        session.turn_count += 1
+        session.updated = time.time()
+        if len(session.turns) >= 2 * self.window_turns and not session.summarizing:
+            session.summarizing = True
+            # In a fresh context, so the summary isn't held to the finished request's deadline
+            task = asyncio.create_task(self._summarize(session, client), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "created": self.created,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "summaries": self.summaries,
+            "summaryFailures": self.summary_failures,
+        }
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._sessions.clear()
+
+    async def _summarize(self, session: ChatSession, client) -> None:
+        folded = session.turns[:self.window_turns]
+        transcript = "\n".join(f"User: {user}\nAssistant: {reply}" for user, reply in folded)
+        prompt = (
+            f"{SUMMARY_INSTRUCTION.format(max_chars=self.summary_max_chars)}\n\n"
+            f"Earlier summary:\n{session.summary or '(none)'}\n\nNew turns:\n{transcript}"
+        )
+        try:
+            summary = (await generateContent(client, prompt, label="Gemini chat summary call")).strip()
+            summary = summary[:self.summary_max_chars]
+            self.summaries += 1
+        except Exception:
+            # Keep the gist locally rather than losing the turns or retrying the model
+            logger.warning("chat summary call failed; keeping a local summary", exc_info=True)
+            self.summary_failures += 1
+            asked = " ".join(f"User asked: {user[:160]}" for user, _ in folded)
+            summary = f"{session.summary} {asked}".strip()[-self.summary_max_chars:]
+        finally:
+            session.summarizing = False
+        # Only appends happened meanwhile, so the folded turns are still the oldest ones
+        session.summary = summary
+        del session.turns[:len(folded)]
+
+    def _purge(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [session_id for session_id, session in self._sessions.items() if session.updated < cutoff]
+        for session_id in expired:
+            del self._sessions[session_id]
+        self.expired += len(expired)
+
+
+def getChatSessions(request: Request) -> ChatSessionStore:
+    """FastAPI dependency returning the chat session store created in the lifespan hook."""
+    return request.app.state.chat_sessions
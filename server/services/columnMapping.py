@@ -0,0 +1,183 @@
+import difflib
+import hashlib
+import os
+import re
+from typing import List, Optional
+
+from fastapi import Request
+
+from services.responseCache import ResponseCache
+
+REQUIRED_FIELDS = [
+    "Transaction Name", "Amount", "Transaction Type",
+    "Date", "Description", "Payment Method",
+]
+
+# Header synonyms per field, following the ones listed in the validator prompt. Shared with
+# the file digest (`services/compaction.py`), which also looks for the optional "Category".
+FIELD_SYNONYMS = {
+    "Transaction Name": ["transaction name", "name", "transaction", "merchant", "payee", "description"],
+    "Amount": ["amount", "price", "cost", "value", "amt", "total", "debit"],
+    "Transaction Type": ["transaction type", "type", "category", "kind"],
+    "Date": ["date", "transaction date", "posting date", "posted date", "trans date"],
+    "Description": ["description", "notes", "note", "memo", "details"],
+    "Payment Method": ["payment method", "payment", "method", "payment type", "account type"],
+    "Category": ["category", "transaction category", "expense category"],
+}
+
+DEFAULT_CONFIDENCE = 0.85
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600.0
+DEFAULT_MAX_ENTRIES = 5000
+
+_AMOUNT_PATTERN = re.compile(r"^[(\-+]?\s*[$€£]?\s*[\d,]+(\.\d+)?\)?$")
+
+
+def normalizeHeader(header: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (header or "").lower()).split())
+
+
+def headerScore(header: str, synonym: str) -> float:
+    """Similarity of a normalized header to a normalized synonym, between 0 and 1."""
+    if header == synonym:
+        return 1.0
+    header_words = header.split()
+    synonym_words = synonym.split()
+    if sorted(header_words) == sorted(synonym_words):
+        return 0.95
+    if all(word in header_words for word in synonym_words):
+        return 0.9 - 0.02 * (len(header_words) - len(synonym_words))
+    return difflib.SequenceMatcher(None, header, synonym).ratio() * 0.9
+
+
+def _assignFields(edges: dict, threshold: float) -> Optional[dict]:
+    """Match every required field to a distinct header using only edges scoring >= threshold.
+
+    Simple augmenting-path bipartite matching; `edges[field]` is sorted best-first so each
+    field keeps its strongest header unless another field needs it more.
+    """
+    owner = {}  # header index -> field
+
+    def place(field, seen):
+        for score, index in edges[field]:
+            if score < threshold or index in seen:
+                continue
+            seen.add(index)
+            if index not in owner or place(owner[index], seen):
+                owner[index] = field
+                return True
+        return False
+
+    for field in REQUIRED_FIELDS:
+        if not place(field, set()):
+            return None
+    return {field: index for index, field in owner.items()}
+
+
+def matchColumns(fieldnames: List[str]) -> tuple:
+    """Fuzzy-match CSV headers to the required fields.
+
+    Returns (mapping of field -> actual header, confidence). Each header is used at most
+    once, and the assignment maximizes the weakest field match, which is reported as the
+    confidence. Returns ({}, 0.0) when the headers cannot cover every field.
+    """
+    normalized = [normalizeHeader(name) for name in fieldnames]
+    edges = {}
+    for field in REQUIRED_FIELDS:
+        synonyms = FIELD_SYNONYMS[field]
+        best = []
+        for index, header in enumerate(normalized):
+            if header:
+                best.append((max(headerScore(header, synonym) for synonym in synonyms), index))
+        edges[field] = sorted(best, reverse=True)
+
+    # Try thresholds from the strongest score down; the first full assignment is the best one
+    for threshold in sorted({score for scored in edges.values() for score, _ in scored}, reverse=True):
+        assignment = _assignFields(edges, threshold)
+        if assignment is not None:
+            return {field: fieldnames[index] for field, index in assignment.items()}, threshold
+    return {}, 0.0
+
+
+def looksLikeTransactions(preview: List[dict], mapping: dict) -> bool:
+    """Cheap relevance check: most preview rows must have a numeric amount and a date value."""
+    if not preview:
+        return False
+    amount_col = mapping.get("Amount")
+    date_col = mapping.get("Date")
+    good = 0
+    for row in preview:
+        amount = (row.get(amount_col) or "").strip()
+        date = (row.get(date_col) or "").strip()
+        if _AMOUNT_PATTERN.match(amount) and any(ch.isdigit() for ch in date):
+            good += 1
+    return good * 2 >= len(preview)
+
+
+class ColumnMappingStore(ResponseCache):
+    """Resolves CSV column mappings without the model when possible.
+
+    Known header layouts (normalized header tuples) map to previously verified mappings, and
+    unknown layouts are tried with the local fuzzy matcher. Only when both fail does the
+    caller need to ask the model, and its verified answer is remembered with `remember`.
+    Counters show how often the model call is avoided.
+    """
+
+    table = "column_mappings"
+
+    def __init__(self, confidence: float = DEFAULT_CONFIDENCE, **kwargs):
+        super().__init__(**kwargs)
+        self.confidence = confidence
+        self.cached_resolutions = 0
+        self.local_resolutions = 0
+        self.model_fallbacks = 0
+
+    @classmethod
+    def fromEnv(cls) -> "ColumnMappingStore":
+        return cls(
+            confidence=float(os.getenv("COLUMN_MAPPING_CONFIDENCE", DEFAULT_CONFIDENCE)),
+            ttl_seconds=float(os.getenv("COLUMN_MAPPING_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            max_entries=int(os.getenv("COLUMN_MAPPING_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            path=os.getenv("COLUMN_MAPPING_PATH") or None,
+        )
+
+    @staticmethod
+    def layoutKey(fieldnames: List[str]) -> str:
+        normalized = "\0".join(normalizeHeader(name) for name in fieldnames)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def resolve(self, fieldnames: List[str], preview: List[dict]) -> Optional[dict]:
+        """Return a field -> header mapping, or None if the model has to validate the file."""
+        by_normalized = {normalizeHeader(name): name for name in fieldnames}
+        known = self.get(self.layoutKey(fieldnames))
+        if known is not None:
+            self.cached_resolutions += 1
+            return {field: by_normalized[header] for field, header in known.items() if header in by_normalized}
+
+        mapping, confidence = matchColumns(fieldnames)
+        if confidence >= self.confidence and looksLikeTransactions(preview, mapping):
+            self.local_resolutions += 1
+            self.remember(fieldnames, mapping)
+            return mapping
+
+        self.model_fallbacks += 1
+        return None
+
+    def remember(self, fieldnames: List[str], mapping: dict) -> None:
+        """Store a verified mapping for this header layout."""
+        self.set(self.layoutKey(fieldnames), {field: normalizeHeader(header) for field, header in mapping.items()})
+
+    def stats(self) -> dict:
+        resolutions = self.cached_resolutions + self.local_resolutions + self.model_fallbacks
+        avoided = self.cached_resolutions + self.local_resolutions
+        return {
+            **super().stats(),
+            "cachedResolutions": self.cached_resolutions,
+            "localResolutions": self.local_resolutions,
+            "modelFallbacks": self.model_fallbacks,
+            "modelAvoidedRatio": round(avoided / resolutions, 4) if resolutions else 0.0,
+        }
+
+
+def getColumnMappingStore(request: Request) -> ColumnMappingStore:
+    """FastAPI dependency returning the shared column mapping store created in the lifespan hook."""
+    return request.app.state.column_mappings
@@ -0,0 +1,227 @@
+import csv
+import io
+import re
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from services.columnMapping import FIELD_SYNONYMS, headerScore, normalizeHeader
+from services.normalization import DATE_FORMATS, canonicalTypes, parseAmounts
+
+# File modes for /processFile: raw text prefix, or a locally computed digest of every row
+FILE_MODES = {"raw", "compact"}
+
+# Fewer parsed amounts than this and the digest says too little; callers fall back to raw text
+MIN_COMPACT_ROWS = 5
+TOP_GROUPS = 12
+TOP_MERCHANTS = 10
+MAX_OUTLIERS = 8
+SAMPLE_ROWS = 3
+MAX_MONTHS = 24
+# PDF text scanned for statement lines (~300 statement pages); the rest of the file is not parsed
+DEFAULT_PDF_MAX_CHARS = 1_000_000
+
+# Columns the digest looks for, and the `FIELD_SYNONYMS` entry whose header names identify
+# them. Category is located before type, since "category" is also a type synonym.
+DIGEST_COLUMNS = {
+    "amount": "Amount",
+    "date": "Date",
+    "category": "Category",
+    "type": "Transaction Type",
+    "merchant": "Transaction Name",
+    "payment": "Payment Method",
+}
+COLUMN_MATCH_THRESHOLD = 0.8
+
+# A statement line: a date, some text, and a trailing amount
+_STATEMENT_LINE = re.compile(
+    r"^\s*(?P<date>\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4})\s+(?P<text>.*?)\s+"
+    r"(?P<amount>[(\-+]?\s*[$€£]?\s*[\d,]*\d(?:\.\d{1,2})?\)?)\s*$"
+)
+
+
+def locateColumns(fieldnames: List[str]) -> dict:
+    """Pick the best distinct header for each digest column; weak matches are left out."""
+    normalized = [normalizeHeader(name) for name in fieldnames]
+    located = {}
+    used = set()
+    for column, field in DIGEST_COLUMNS.items():
+        synonyms = FIELD_SYNONYMS[field]
+        scored = [
+            (max(headerScore(header, synonym) for synonym in synonyms), index)
+            for index, header in enumerate(normalized)
+            if header and index not in used
+        ]
+        if not scored:
+            continue
+        score, index = max(scored)
+        if score >= COLUMN_MATCH_THRESHOLD:
+            located[column] = index
+            used.add(index)
+    return located
+
+
+def parseMonths(values: np.ndarray) -> np.ndarray:
+    """Map date strings to "YYYY-MM" keys ("" when unparseable); each distinct value is parsed once."""
+    if values.size == 0:
+        return np.zeros(0, dtype="<U7")
+    unique, inverse = np.unique(np.char.strip(values.astype(str)), return_inverse=True)
+    months = np.array([_monthKey(value) for value in unique], dtype="<U7")
+    return months[inverse]
+
+
+def _monthKey(value: str) -> str:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m")
+        except ValueError:
+            continue
+    # ISO timestamps and similar: keep the date part
+    match = re.match(r"^(\d{4})-(\d{2})", value)
+    return f"{match.group(1)}-{match.group(2)}" if match else ""
+
+
+def _groupTotals(keys: np.ndarray, amounts: np.ndarray):
+    """Return (keys, totals, counts) per distinct key, sorted by total descending."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=amounts, minlength=unique.size)
+    counts = np.bincount(inverse, minlength=unique.size)
+    order = np.argsort(-totals, kind="stable")
+    return unique[order], totals[order], counts[order]
+
+
+def _money(value: float) -> str:
+    value = float(value) + 0.0  # no "-$0.00"
+    return f"-${-value:,.2f}" if value < 0 else f"${value:,.2f}"
+
+
+def buildDigest(
+    columns: dict, source: str, total_rows: int, sample_lines: List[str], coverage: str = "the whole file"
+) -> Optional[str]:
+    """Summarize transaction columns into a compact text digest.
+
+    `columns` maps digest column names ("amount", "date", "type", "category", "merchant",
+    "payment") to equal-length string arrays; only "amount" is required. `coverage` says
+    which part of the file the rows come from. Returns None when fewer than
+    `MIN_COMPACT_ROWS` amounts parse, so the caller can send raw text instead.
+    """
+    amounts = parseAmounts(columns["amount"])
+    valid = ~np.isnan(amounts)
+    if int(valid.sum()) < MIN_COMPACT_ROWS:
+        return None
+    amounts = amounts[valid]
+    columns = {name: values[valid] for name, values in columns.items()}
+
+    # Income vs expense: by the type column when present, otherwise by sign
+    # (all-positive files with no type column are treated as spending)
+    if "type" in columns:
+        is_income = canonicalTypes(columns["type"].astype(str), amounts < 0) == "income"
+    else:
+        is_income = amounts > 0 if (amounts < 0).any() else np.zeros(amounts.size, dtype=bool)
+    spend = np.where(is_income, 0.0, np.abs(amounts))
+    income = np.where(is_income, np.abs(amounts), 0.0)
+
+    magnitude = np.abs(amounts)
+    lines = [
+        f"COMPACT DIGEST of {source}: {total_rows} rows, {amounts.size} with a parseable amount"
+        f" (computed locally over {coverage})",
+        f"Totals: income {_money(income.sum())}, spending {_money(spend.sum())}, net {_money(income.sum() - spend.sum())}",
+        f"Amounts: min {_money(amounts.min())}, max {_money(amounts.max())}, mean {_money(amounts.mean())},"
+        f" median {_money(float(np.median(amounts)))}",
+    ]
+
+    if "date" in columns:
+        months = parseMonths(columns["date"])
+        dated = months != ""
+        if dated.any():
+            unique, inverse = np.unique(months[dated], return_inverse=True)
+            lines.append(f"Date range: {unique[0]} to {unique[-1]} ({unique.size} months)")
+            monthly_spend = np.bincount(inverse, weights=spend[dated], minlength=unique.size)
+            monthly_income = np.bincount(inverse, weights=income[dated], minlength=unique.size)
+            shown = min(MAX_MONTHS, unique.size)
+            lines.append(f"By month (income / spending; last {shown}):")
+            for month, month_income, month_spend in zip(unique[-shown:], monthly_income[-shown:], monthly_spend[-shown:]):
+                lines.append(f"  {month}: {_money(month_income)} / {_money(month_spend)}")
+
+    for column, title in (("category", "category"), ("type", "type"), ("payment", "payment method")):
+        if column not in columns:
+            continue
+        keys, totals, counts = _groupTotals(np.char.strip(columns[column].astype(str)), magnitude)
+        shown = min(TOP_GROUPS, keys.size)
+        lines.append(f"By {title} (total, count; top {shown} of {keys.size}):")
+        for key, total, count in zip(keys[:shown], totals[:shown], counts[:shown]):
+            lines.append(f"  {key or '(blank)'}: {_money(total)}, {count}")
+
+    if "merchant" in columns:
+        keys, totals, counts = _groupTotals(np.char.strip(columns["merchant"].astype(str)), spend)
+        shown = min(TOP_MERCHANTS, keys.size)
+        lines.append(f"Top merchants by spending (of {keys.size}):")
+        for key, total, count in zip(keys[:shown], totals[:shown], counts[:shown]):
+            if total <= 0:
+                break
+            lines.append(f"  {key or '(blank)'}: {_money(total)}, {count} transactions")
+
+    # Outliers: amounts far above the interquartile range
+    q1, q3 = np.percentile(magnitude, [25, 75])
+    cutoff = q3 + 3 * (q3 - q1)
+    outliers = np.flatnonzero(magnitude > cutoff)
+    if outliers.size:
+        outliers = outliers[np.argsort(-magnitude[outliers], kind="stable")][:MAX_OUTLIERS]
+        lines.append(f"Outliers (above {_money(cutoff)}):")
+        for index in outliers:
+            label = " | ".join(
+                str(columns[name][index]).strip() for name in ("date", "merchant", "category") if name in columns
+            )
+            lines.append(f"  {_money(amounts[index])} {label}".rstrip())
+
+    if sample_lines:
+        lines.append("Sample rows:")
+        lines.extend(f"  {line}" for line in sample_lines)
+    return "\n".join(lines)
+
+
+def compactCsv(file_content: bytes, filename: str) -> Optional[str]:
+    """Digest of every row in a CSV upload, or None if no amount column can be found."""
+    reader = csv.reader(io.StringIO(file_content.decode(errors="replace")))
+    try:
+        rows = list(reader)
+    except csv.Error:
+        return None
+    if len(rows) < 2:
+        return None
+    header, body = rows[0], rows[1:]
+    located = locateColumns(header)
+    if "amount" not in located:
+        return None
+
+    # Only the located columns are kept; short rows get blanks
+    columns = {
+        name: np.array([row[index] if index < len(row) else "" for row in body], dtype=str)
+        for name, index in located.items()
+    }
+    sample = [", ".join(row) for row in rows[:SAMPLE_ROWS + 1]]
+    return buildDigest(columns, filename, len(body), sample)
+
+
+def compactStatementText(text: str, filename: str, partial: bool = False) -> Optional[str]:
+    """Digest of statement-style lines (date ... amount) found in extracted PDF text.
+
+    Pass `partial` when `text` stops before the end of the document, so the digest says so.
+    """
+    dates, merchants, amounts = [], [], []
+    for line in text.splitlines():
+        match = _STATEMENT_LINE.match(line)
+        if match:
+            dates.append(match.group("date"))
+            merchants.append(" ".join(match.group("text").split()[:4]))
+            amounts.append(match.group("amount"))
+    if len(amounts) < MIN_COMPACT_ROWS:
+        return None
+    columns = {
+        "amount": np.array(amounts, dtype=str),
+        "date": np.array(dates, dtype=str),
+        "merchant": np.array(merchants, dtype=str),
+    }
+    coverage = f"the first {len(text):,} characters of the file's text" if partial else "the whole file"
+    return buildDigest(columns, filename, len(amounts), [], coverage)
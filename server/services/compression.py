@@ -0,0 +1,120 @@
+import os
+import zlib
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+DEFAULT_MIN_BYTES = 1024
+# On a 100k-transaction import level 9 is ~20% smaller than 6 but takes ~8x as long (1.8s)
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+# Bodies at least this large are compressed in a worker thread instead of on the event loop
+THREAD_MIN_BYTES = 128 * 1024
+# Streams whose chunks must reach the client as they are sent, unbuffered and unmodified
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class GzipEncoder:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        # wbits 16 + MAX_WBITS writes a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        compressed = self._compressor.compress(body)
+        return compressed + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        compressed = self._compressor.process(body)
+        return compressed + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware:
+    """Compress response bodies of at least `COMPRESSION_MIN_BYTES` with brotli or gzip.
+
+    Brotli is used when the client accepts it and the `brotli` package is installed,
+    otherwise gzip. Streamed responses (NDJSON imports, batch results) are compressed chunk
+    by chunk with a flush after each, so lines still arrive as they are produced; Server-Sent
+    Events and already-encoded bodies are passed through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.minimum_size = int(os.getenv("COMPRESSION_MIN_BYTES", DEFAULT_MIN_BYTES))
+        self.gzip_level = int(os.getenv("GZIP_LEVEL", DEFAULT_GZIP_LEVEL))
+        self.brotli_quality = int(os.getenv("BROTLI_QUALITY", DEFAULT_BROTLI_QUALITY))
+
+    def _encoder(self, accepted: str):
+        if brotli is not None and "br" in accepted:
+            return BrotliEncoder(self.brotli_quality)
+        if "gzip" in accepted:
+            return GzipEncoder(self.gzip_level)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoder = self._encoder(Headers(scope=scope).get("accept-encoding", ""))
+        if encoder is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        # None until the first body chunk decides; then True (compress) or False (pass through)
+        compressing = None
+
+        async def sendCompressed(message):
+            nonlocal start, compressing
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message.get("headers", []))
+                if "content-encoding" in headers or headers.get("content-type", "").startswith(UNCOMPRESSED_TYPES):
+                    compressing = False
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or compressing is False:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressing is None:
+                if not more_body and len(body) < self.minimum_size:
+                    compressing = False
+                    await send(start)
+                    await send(message)
+                    return
+                compressing = True
+                start["headers"] = list(start.get("headers", []))
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoder.encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+
+            if len(body) >= THREAD_MIN_BYTES:
+                compressed = await anyio.to_thread.run_sync(encoder.compress, body, more_body)
+            else:
+                compressed = encoder.compress(body, more_body)
+            if start is not None:
+                if not more_body:
+                    MutableHeaders(raw=start["headers"])["Content-Length"] = str(len(compressed))
+                await send(start)
+                start = None
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, sendCompressed)
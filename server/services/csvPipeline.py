@@ -0,0 +1,153 @@
+import csv
+import io
+import itertools
+from typing import BinaryIO, Iterator, List, Optional
+
+import numpy as np
+
+from services.normalization import amountsToCents, canonicalTypes, inferAmountFormat, inferDateFormat, toIsoDates
+
+# Rows buffered up front for header checks and the validation prompt
+PREVIEW_ROWS = 10
+
+# Transactions per NDJSON line when streaming import results
+DEFAULT_BATCH_SIZE = 500
+
+
+class CsvStream:
+    """Incrementally decoded `csv.DictReader` over a binary file object.
+
+    Only the first `PREVIEW_ROWS` rows are held in memory; `rows()` replays them and then
+    continues reading the file, so the whole upload is never decoded or materialized at once.
+    """
+
+    def __init__(self, fileobj: BinaryIO, encoding: str = "utf-8"):
+        # TextIOWrapper reads and decodes the binary stream chunk by chunk
+        self._text = io.TextIOWrapper(fileobj, encoding=encoding, errors="replace", newline="")
+        self._reader = csv.DictReader(self._text)
+        self.fieldnames: Optional[List[str]] = self._reader.fieldnames
+        self.preview: List[dict] = list(itertools.islice(self._reader, PREVIEW_ROWS)) if self.fieldnames else []
+
+    def rows(self) -> Iterator[dict]:
+        return itertools.chain(self.preview, self._reader)
+
+    def listRows(self) -> Iterator[list]:
+        """Like `rows()` but yields plain lists in `fieldnames` order, skipping blank lines."""
+        preview = ([row.get(name) or "" for name in self.fieldnames] for row in self.preview)
+        # The DictReader's underlying csv.reader continues where the preview stopped
+        return itertools.chain(preview, filter(None, self._reader.reader))
+
+    def close(self) -> None:
+        # Detach so the upload's own file object stays open for the framework to clean up
+        if self._text is not None:
+            self._text.detach()
+            self._text = None
+
+
+# Mapped fields copied from each row, with the CSV column each one comes from
+TRANSACTION_FIELDS = (
+    ("transactionName", "Transaction Name"),
+    ("amount", "Amount"),
+    ("transactionType", "Transaction Type"),
+    ("date", "Date"),
+    ("description", "Description"),
+    ("paymentMethod", "Payment Method"),
+)
+OUTPUT_KEYS = [key for key, _ in TRANSACTION_FIELDS] + ["amountCents", "isoDate", "normalizedType"]
+REQUIRED_FIELDS = ("transactionName", "amount", "transactionType", "date")
+
+# Rejected rows reported back with their reason; later ones are only counted
+MAX_ROW_ERRORS = 100
+
+
+def iterNormalizedBatches(csv_stream: CsvStream, column_mapping: dict, counts: dict, batch_size: int) -> Iterator[List[dict]]:
+    """Map and normalize CSV rows a batch at a time, one numpy pass per column.
+
+    Each transaction keeps the mapped text fields and gains `amountCents` (absolute integer
+    cents, in the separators inferred once per file), `isoDate` (`yyyy-MM-dd`, in the date
+    format inferred from the first batch) and `normalizedType` ("expense"/"income", or None
+    when neither the type text nor the amount's sign decides it, e.g. a Category column).
+    Rows that fail are left out; `counts` is updated in place with `totalRows`,
+    `skippedRows`, `amountFormat`, `dateFormat` and up to `MAX_ROW_ERRORS` `rowErrors`
+    entries of {row, reason} (row 1 is the first data row).
+    """
+    index = {name: i for i, name in enumerate(csv_stream.fieldnames or [])}
+    positions = [index.get(column_mapping.get(column, "")) for _, column in TRANSACTION_FIELDS]
+    keys = [key for key, _ in TRANSACTION_FIELDS]
+    counts.setdefault("rowErrors", [])
+    amount_format = None
+    date_format = None
+    date_cache = {}
+    row_number = 0
+
+    for chunk in iterBatches(csv_stream.listRows(), batch_size):
+        size = len(chunk)
+        numbers = np.arange(row_number + 1, row_number + size + 1)
+        row_number += size
+        counts["totalRows"] += size
+
+        # Transpose the batch into columns; short rows are padded with empty strings
+        columns = list(itertools.zip_longest(*chunk, fillvalue=""))
+        values = {
+            key: np.char.strip(np.array(columns[position], dtype=str))
+            if position is not None and position < len(columns) else np.full(size, "", dtype="<U1")
+            for key, position in zip(keys, positions)
+        }
+
+        if amount_format is None:
+            # Retried each batch until some amount shows the separators ("12.50", "1.234,50")
+            amount_format = inferAmountFormat(values["amount"])
+            counts["amountFormat"] = amount_format
+        cents, amount_ok, negative = amountsToCents(values["amount"], amount_format)
+        if date_format is None:
+            date_format = inferDateFormat(values["date"])
+            counts["dateFormat"] = date_format
+        iso_dates = toIsoDates(values["date"], date_format, date_cache)
+        types = canonicalTypes(values["transactionType"], negative)
+
+        checks = [(values[key] == "", f"missing {key}") for key in REQUIRED_FIELDS]
+        checks += [
+            (~amount_ok, "unparseable amount"),
+            (iso_dates == "", "unrecognized date"),
+        ]
+        reasons = np.select([failed for failed, _ in checks], [reason for _, reason in checks], default="")
+        rejected = reasons != ""
+        if rejected.any():
+            counts["skippedRows"] += int(rejected.sum())
+            room = MAX_ROW_ERRORS - len(counts["rowErrors"])
+            if room > 0:
+                counts["rowErrors"].extend(
+                    {"row": int(number), "reason": str(reason)}
+                    for number, reason in zip(numbers[rejected][:room], reasons[rejected][:room])
+                )
+
+        kept = ~rejected
+        batch = [
+            dict(zip(OUTPUT_KEYS, row))
+            for row in zip(
+                *(values[key][kept].tolist() for key in keys),
+                cents[kept].tolist(),
+                iso_dates[kept].tolist(),
+                [kind or None for kind in types[kept].tolist()],
+            )
+        ]
+        if batch:
+            yield batch
+
+
+def toColumns(transactions: List[dict]) -> dict:
+    """Columnar layout of normalized transactions: one array per field, in `OUTPUT_KEYS` order.
+
+    Field names are sent once instead of on every row, which roughly halves an import
+    response before compression.
+    """
+    return {key: [transaction[key] for transaction in transactions] for key in OUTPUT_KEYS}
+
+
+def iterBatches(items: Iterator, batch_size: int) -> Iterator[list]:
+    """Group a stream of items into lists of at most `batch_size`."""
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,42 @@
+import hashlib
+import os
+
+from fastapi import Request
+
+from services.responseCache import ResponseCache
+
+DEFAULT_TTL_SECONDS = 3600.0
+DEFAULT_MAX_ENTRIES = 200
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class DocumentStore(ResponseCache):
+    """Parsed text and extraction summaries of uploaded files, keyed by document ID.
+
+    The document ID is a hash of the file bytes (plus extension, since that decides how the
+    file is parsed), so re-uploading an identical file reuses the earlier extraction.
+    Eviction, TTL and optional sqlite persistence work as in `ResponseCache`.
+    """
+
+    table = "documents"
+
+    @classmethod
+    def fromEnv(cls) -> "DocumentStore":
+        return cls(
+            ttl_seconds=float(os.getenv("DOCUMENT_STORE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            max_entries=int(os.getenv("DOCUMENT_STORE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            max_bytes=int(os.getenv("DOCUMENT_STORE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            path=os.getenv("DOCUMENT_STORE_PATH") or None,
+        )
+
+    @staticmethod
+    def documentId(file_content: bytes, filename: str) -> str:
+        extension = os.path.splitext((filename or "").lower())[1]
+        digest = hashlib.sha256(extension.encode("utf-8") + b"\0")
+        digest.update(file_content)
+        return digest.hexdigest()
+
+
+def getDocumentStore(request: Request) -> DocumentStore:
+    """FastAPI dependency returning the shared document store created in the lifespan hook."""
+    return request.app.state.document_store
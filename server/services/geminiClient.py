@@ -0,0 +1,280 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+import httpx
+from fastapi import HTTPException, Request
+
+from services.admission import Singleflight, coalesce, modelSlot, modelSlotFree
+from services.metrics import recordModelCall
+from services.resilience import UpstreamError, callPolicy, deadlineExceeded, isTransient, requestDeadline
+
+if TYPE_CHECKING:
+    # Only for annotations; the runtime import is deferred to createGeminiClient
+    from google import genai
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Size of the keep-alive connection pool shared by every request in this process
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEPALIVE_SECONDS = 30.0
+
+# Upper bound for one generate_content attempt; the request deadline may cut it shorter
+DEFAULT_CALL_TIMEOUT_SECONDS = 60.0
+
+# Threads used only for clients without an async API (e.g. simple local stubs)
+DEFAULT_EXECUTOR_WORKERS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def createGeminiClient(api_key: Optional[str] = None, pool_size: Optional[int] = None) -> "genai.Client":
+    """Build the single Gemini client used for the lifetime of the app.
+
+    The underlying httpx pools are sized from `GEMINI_POOL_SIZE` (or `pool_size`) and keep
+    connections alive between requests, so only the first call pays for the TLS handshake.
+    Raises RuntimeError if no API key is configured. `google.genai` is imported here rather
+    than at module import; it is the slowest import in the app.
+    """
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY is not configured. Set it in the environment or server/.env.")
+
+    from google import genai
+    from google.genai import types
+
+    pool_size = pool_size or int(os.getenv("GEMINI_POOL_SIZE", DEFAULT_POOL_SIZE))
+    keepalive = float(os.getenv("GEMINI_KEEPALIVE_SECONDS", DEFAULT_KEEPALIVE_SECONDS))
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=keepalive,
+    )
+    http_options = types.HttpOptions(
+        client_args={"limits": limits},
+        async_client_args={"limits": limits},
+    )
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+async def closeGeminiClient(client) -> None:
+    """Release the pooled connections of a client created by `createGeminiClient`.
+
+    Stub clients without close hooks are ignored.
+    """
+    global _executor
+    aio = getattr(client, "aio", None)
+    if aio is not None and hasattr(aio, "aclose"):
+        await aio.aclose()
+    if hasattr(client, "close"):
+        client.close()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def getGeminiClient(request: Request):
+    """FastAPI dependency returning the shared client stored on `app.state` by the lifespan hook."""
+    client = getattr(request.app.state, "gemini_client", None)
+    if client is None:
+        raise HTTPException(status_code=500, detail="GEMINI_API_KEY is not configured")
+    return client
+
+
+def _getExecutor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        workers = int(os.getenv("GEMINI_EXECUTOR_WORKERS", DEFAULT_EXECUTOR_WORKERS))
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini")
+    return _executor
+
+
+async def _callModel(client, prompt: str):
+    # Prefer the SDK's native async API; fall back to a bounded thread pool for sync-only clients
+    aio = getattr(client, "aio", None)
+    if aio is not None:
+        return await aio.models.generate_content(model=GEMINI_MODEL, contents=prompt)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _getExecutor(),
+        lambda: client.models.generate_content(model=GEMINI_MODEL, contents=prompt),
+    )
+
+
+async def generateContent(client, prompt: str, label: str = "Gemini call", timeout: Optional[float] = None) -> str:
+    """Run one Gemini call without blocking the event loop and return the response text.
+
+    Failures are raised as HTTPException: 504 when an attempt exceeds `timeout`
+    (default `GEMINI_TIMEOUT_SECONDS`) or the request's deadline passes, 502 for any other
+    upstream error. `label` prefixes the error detail, e.g. "Gemini chat call".
+
+    Concurrent calls with the same prompt share one upstream call, and every attempt first
+    takes an admission slot, so an overloaded server answers 429/503 with `Retry-After`
+    (see `services/admission.py`). Transient failures are retried with jittered backoff
+    within the retry budget, and slow calls can be hedged (see `services/resilience.py`).
+    """
+    if timeout is None:
+        timeout = float(os.getenv("GEMINI_TIMEOUT_SECONDS", DEFAULT_CALL_TIMEOUT_SECONDS))
+    key = Singleflight.makeKey(GEMINI_MODEL, prompt)
+    call = coalesce(key, lambda: _resilientCall(client, prompt, label, timeout))
+    deadline = requestDeadline()
+    if deadline is None:
+        return await call
+    # A coalesced call runs to its first caller's deadline; later callers still stop at their own
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        call.close()
+        raise deadlineExceeded(label)
+    try:
+        return await asyncio.wait_for(call, timeout=remaining)
+    except asyncio.TimeoutError:
+        raise deadlineExceeded(label)
+
+
+async def _resilientCall(client, prompt: str, label: str, timeout: float) -> str:
+    policy = callPolicy()
+    if policy is None:
+        return await _admittedCall(client, prompt, label, timeout)
+    policy.calls += 1
+    policy.budget.deposit()
+    deadline = requestDeadline()
+    attempt = 1
+    while True:
+        attempt_timeout = timeout if deadline is None else min(timeout, deadline - time.monotonic())
+        if attempt_timeout <= 0:
+            raise deadlineExceeded(label)
+        try:
+            return await _hedgedCall(client, prompt, label, attempt_timeout, policy)
+        except UpstreamError as e:
+            if not e.transient or attempt >= policy.max_attempts:
+                raise
+            delay = policy.backoff(attempt)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            if not policy.budget.withdraw():
+                policy.retries_denied += 1
+                raise
+        policy.retries += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def _hedgedCall(client, prompt: str, label: str, timeout: float, policy) -> str:
+    """One attempt; past the hedge delay a duplicate is started and the first success wins."""
+    delay = policy.hedgeDelay()
+    if delay is None or delay >= timeout:
+        return await _admittedCall(client, prompt, label, timeout, policy)
+    primary = asyncio.ensure_future(_admittedCall(client, prompt, label, timeout, policy))
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        # Hedge only into spare capacity: never queue behind other requests for a duplicate
+        if done or not modelSlotFree() or not policy.budget.withdraw():
+            return await primary
+        policy.hedges += 1
+        hedge = asyncio.ensure_future(_admittedCall(client, prompt, label, timeout - delay, policy))
+        pending.add(hedge)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    policy.hedge_wins += task is hedge
+                    return task.result()
+            if not pending:
+                # Both failed; report the original attempt's error
+                return primary.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _admittedCall(client, prompt: str, label: str, timeout: float, policy=None) -> str:
+    async with modelSlot():
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(_callModel(client, prompt), timeout=timeout)
+        except asyncio.TimeoutError:
+            recordModelCall(label, prompt, None, time.perf_counter() - started, "timeout")
+            raise UpstreamError(504, f"{label} timed out after {timeout:g}s", transient=True)
+        except asyncio.CancelledError:
+            recordModelCall(label, prompt, None, time.perf_counter() - started, "cancelled")
+            raise
+        except Exception as e:
+            recordModelCall(label, prompt, None, time.perf_counter() - started, "error")
+            raise UpstreamError(502, f"{label} failed: {e}", transient=isTransient(e))
+    elapsed = time.perf_counter() - started
+    text = getattr(response, "text", str(response))
+    recordModelCall(label, prompt, len(text), elapsed, "ok", response)
+    if policy is not None:
+        policy.observe(elapsed)
+    return text
+
+
+async def streamContent(
+    client, prompt: str, label: str = "Gemini call", timeout: Optional[float] = None
+) -> AsyncIterator[str]:
+    """Yield response text chunks as the model generates them.
+
+    `timeout` bounds the wait for each chunk rather than the whole stream. Closing the
+    generator (e.g. when the HTTP client disconnects) closes the upstream stream too.
+    Clients without an async streaming API get the full response as a single chunk.
+    The stream holds an admission slot until it finishes; streams are never coalesced.
+    """
+    if timeout is None:
+        timeout = float(os.getenv("GEMINI_TIMEOUT_SECONDS", DEFAULT_CALL_TIMEOUT_SECONDS))
+    aio = getattr(client, "aio", None)
+    if aio is None or not hasattr(aio.models, "generate_content_stream"):
+        yield await generateContent(client, prompt, label=label, timeout=timeout)
+        return
+
+    async with modelSlot():
+        started = time.perf_counter()
+        outcome = "error"
+        characters = 0
+        upstream = _streamUpstream(aio, prompt, label, timeout)
+        try:
+            async for text in upstream:
+                characters += len(text)
+                yield text
+            outcome = "ok"
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        finally:
+            await upstream.aclose()
+            recordModelCall(label, prompt, characters, time.perf_counter() - started, outcome)
+
+
+async def _streamUpstream(aio, prompt: str, label: str, timeout: float) -> AsyncIterator[str]:
+    deadline = requestDeadline()
+    # Only the wait for the stream to open is bounded by the deadline; a started answer may finish
+    open_timeout = timeout if deadline is None else min(timeout, deadline - time.monotonic())
+    if open_timeout <= 0:
+        raise deadlineExceeded(label)
+    try:
+        upstream = await asyncio.wait_for(
+            aio.models.generate_content_stream(model=GEMINI_MODEL, contents=prompt), timeout=open_timeout
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"{label} timed out after {open_timeout:g}s")
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"{label} failed: {e}")
+
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(upstream.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail=f"{label} stalled for {timeout:g}s")
+            except Exception as e:
+                raise HTTPException(status_code=502, detail=f"{label} failed: {e}")
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+    finally:
+        if hasattr(upstream, "aclose"):
+            await upstream.aclose()
@@ -0,0 +1,138 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+TRANSACTION_TYPES = ("expense", "income")
+
+
+def _bucketTotals(buckets: np.ndarray, amounts: np.ndarray):
+    """Sum `amounts` per distinct bucket value, returning (unique buckets, totals)."""
+    if buckets.size == 0:
+        return buckets, np.zeros(0)
+    unique, inverse = np.unique(buckets, return_inverse=True)
+    return unique, np.bincount(inverse, weights=amounts, minlength=unique.size)
+
+
+def computeHealthScore(
+    monthly_budget: float,
+    amounts: Sequence[float],
+    transaction_types: Sequence[str],
+    dates: Sequence[str],
+    savings: Optional[float] = None,
+) -> dict:
+    """Compute the four health-score components from raw transactions.
+
+    `dates` are ISO `yyyy-MM-dd` strings and `transaction_types` are "expense" or
+    "income" (case-insensitive, surrounding whitespace ignored). Scoring follows the tiers documented for
+    `/healthScore`:
+
+    - Budget Adherence (0-40): average over months of the spend/budget tier
+      (<=80% -> 40, <=90% -> 30, <=100% -> 20, <=110% -> 10, otherwise 0)
+    - Savings Rate (0-30): (income - expenses) / income over the whole period
+      (>=30% -> 30, >=20% -> 20, >=10% -> 15, >0% -> 5, otherwise 0)
+    - Spending Consistency (0-20): 20 * (1 - coefficient of variation) of monthly
+      spend, using weekly spend when less than two months are present (0 without spending)
+    - Emergency Fund (0-10): months of runway = savings / average monthly spend
+      (>=3 -> 10, >=2 -> 7, >=1 -> 5, >0 -> 2, otherwise 0)
+
+    Raises ValueError for malformed dates and unknown transaction types.
+    """
+    amounts = np.abs(np.asarray(amounts, dtype=np.float64))
+    types = np.array([str(kind).strip().casefold() for kind in transaction_types], dtype=str)
+    unknown = sorted(set(types[~np.isin(types, TRANSACTION_TYPES)].tolist()))
+    if unknown:
+        raise ValueError(f"unknown transactionType {', '.join(map(repr, unknown[:5]))}; use 'expense' or 'income'")
+    days = np.asarray(dates, dtype="datetime64[D]")
+    is_expense = types == "expense"
+    is_income = types == "income"
+
+    expense_amounts = np.where(is_expense, amounts, 0.0)
+    months, monthly_expenses = _bucketTotals(days.astype("datetime64[M]"), expense_amounts)
+    total_expenses = float(expense_amounts.sum())
+    total_income = float(np.where(is_income, amounts, 0.0).sum())
+
+    # Budget adherence: tier each month's spend ratio, then average the tiers
+    if monthly_budget and monthly_budget > 0 and months.size:
+        ratios = monthly_expenses / monthly_budget
+        tiers = np.select(
+            [ratios <= 0.8, ratios <= 0.9, ratios <= 1.0, ratios <= 1.1],
+            [40, 30, 20, 10],
+            default=0,
+        )
+        budget_score = int(round(float(tiers.mean())))
+    else:
+        ratios = np.zeros(0)
+        budget_score = 0
+
+    # Savings rate across the whole period
+    savings_rate = (total_income - total_expenses) / total_income if total_income > 0 else 0.0
+    if savings_rate >= 0.3:
+        savings_score = 30
+    elif savings_rate >= 0.2:
+        savings_score = 20
+    elif savings_rate >= 0.1:
+        savings_score = 15
+    elif savings_rate > 0:
+        savings_score = 5
+    else:
+        savings_score = 0
+
+    # Spending consistency from the coefficient of variation of spend per period
+    periods = monthly_expenses
+    if months.size < 2:
+        _, periods = _bucketTotals(days[is_expense].astype("datetime64[W]"), amounts[is_expense])
+    mean_spend = float(periods.mean()) if periods.size else 0.0
+    variation = float(periods.std() / mean_spend) if mean_spend > 0 else 0.0
+    if mean_spend > 0:
+        consistency_score = int(round(20 * min(1.0, max(0.0, 1.0 - variation))))
+    else:
+        consistency_score = 0
+
+    # Emergency fund: months of average spend covered by savings
+    avg_monthly_expense = float(monthly_expenses.mean()) if months.size else 0.0
+    balance = float(savings or 0.0)
+    if avg_monthly_expense > 0:
+        runway_months = balance / avg_monthly_expense
+    else:
+        runway_months = float("inf") if balance > 0 else 0.0
+    if runway_months >= 3:
+        emergency_score = 10
+    elif runway_months >= 2:
+        emergency_score = 7
+    elif runway_months >= 1:
+        emergency_score = 5
+    elif runway_months > 0:
+        emergency_score = 2
+    else:
+        emergency_score = 0
+
+    return {
+        "score": budget_score + savings_score + consistency_score + emergency_score,
+        "budgetAdherenceScore": budget_score,
+        "savingsRateScore": savings_score,
+        "spendingConsistencyScore": consistency_score,
+        "emergencyFundScore": emergency_score,
+        "metrics": {
+            "months": int(months.size),
+            "totalIncome": round(total_income, 2),
+            "totalExpenses": round(total_expenses, 2),
+            "averageBudgetUsage": round(float(ratios.mean()), 4) if ratios.size else None,
+            "savingsRate": round(savings_rate, 4),
+            "spendingVariation": round(variation, 4),
+            "runwayMonths": round(runway_months, 2) if np.isfinite(runway_months) else None,
+        },
+    }
+
+
+def formatHealthScore(result: dict, recommendations: str = "") -> str:
+    """Render a computed score in the same SCORE/BREAKDOWN/RECOMMENDATIONS text the model returns."""
+    return (
+        f"SCORE: {result['score']}\n"
+        "BREAKDOWN:\n"
+        f"Budget Adherence: {result['budgetAdherenceScore']}\n"
+        f"Savings Rate: {result['savingsRateScore']}\n"
+        f"Spending Consistency: {result['spendingConsistencyScore']}\n"
+        f"Emergency Fund: {result['emergencyFundScore']}\n"
+        "RECOMMENDATIONS:\n"
+        f"{recommendations}"
+    ).strip()
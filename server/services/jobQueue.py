@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUED = 100
+DEFAULT_RESULT_TTL_SECONDS = 3600.0
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """One submitted unit of work: its input, progress and, once finished, result or error."""
+
+    def __init__(self, job_id: str, key: str, kind: str, params: dict, payload: Optional[bytes], created: float):
+        self.id = job_id
+        self.key = key
+        self.kind = kind
+        self.params = params
+        self.payload = payload
+        self.status = QUEUED
+        self.stage = "queued"
+        self.progress = 0.0
+        self.result: Optional[dict] = None
+        self.error: Optional[dict] = None
+        self.created = created
+        self.updated = created
+        self.expires: Optional[float] = None
+        self.cancel_requested = False
+        self.task: Optional[asyncio.Task] = None
+        self._onChange: Optional[Callable[["Job"], None]] = None
+
+    def report(self, stage: str, progress: Optional[float] = None) -> None:
+        """Called by job handlers to publish the current stage and a 0-1 progress estimate."""
+        self.stage = stage
+        if progress is not None:
+            self.progress = round(min(1.0, max(0.0, progress)), 4)
+        self.updated = time.time()
+        if self._onChange is not None:
+            self._onChange(self)
+
+    def view(self) -> dict:
+        data = {
+            "jobId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "createdAt": self.created,
+            "updatedAt": self.updated,
+        }
+        if self.expires is not None:
+            data["expiresAt"] = self.expires
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """Background job queue for slow uploads, run by a pool of asyncio worker tasks.
+
+    `submit` stores the upload and returns at once; identical submissions (same kind,
+    parameters and bytes) attach to the existing job while it is queued, running or its
+    result is retained. Finished jobs are kept for `result_ttl` seconds. CPU-heavy parsing
+    inside handlers is already off-loaded (thread/process pools), so the workers only
+    orchestrate. With `path`, jobs are written through to sqlite and unfinished ones are
+    re-queued on the next start (when `requeue` is set), so no external broker is needed.
+    Worker processes sharing the file can report each other's jobs, but only the process
+    that accepted a job runs or cancels it.
+    """
+
+    table = "jobs"
+
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[[Job], Awaitable[dict]]],
+        workers: int = DEFAULT_WORKERS,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        result_ttl: float = DEFAULT_RESULT_TTL_SECONDS,
+        path: Optional[str] = None,
+        requeue: bool = True,
+    ):
+        self.handlers = handlers
+        self.requeue = requeue
+        self.worker_count = max(1, workers)
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.submitted = 0
+        self.deduplicated = 0
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (id TEXT PRIMARY KEY, key TEXT, kind TEXT, status TEXT,"
+                " stage TEXT, progress REAL, params TEXT, payload BLOB, result TEXT, error TEXT,"
+                " created REAL, updated REAL, expires REAL)"
+            )
+
+    @classmethod
+    def fromEnv(cls, handlers: Dict[str, Callable[[Job], Awaitable[dict]]]) -> "JobQueue":
+        return cls(
+            handlers,
+            workers=int(os.getenv("JOB_WORKERS", DEFAULT_WORKERS)),
+            max_queued=int(os.getenv("JOB_MAX_QUEUED", DEFAULT_MAX_QUEUED)),
+            result_ttl=float(os.getenv("JOB_RESULT_TTL_SECONDS", DEFAULT_RESULT_TTL_SECONDS)),
+            path=os.getenv("JOB_STORE_PATH") or None,
+            requeue=os.getenv("JOB_REQUEUE_ON_START", "1") != "0",
+        )
+
+    @staticmethod
+    def makeKey(kind: str, params: dict, payload: Optional[bytes]) -> str:
+        digest = hashlib.sha256(kind.encode("utf-8") + b"\0")
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8") + b"\0")
+        digest.update(payload or b"")
+        return digest.hexdigest()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        if self._db is not None:
+            self._load()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def submit(self, kind: str, params: dict, payload: Optional[bytes] = None) -> tuple:
+        """Queue a job, or return the live job for an identical submission. Returns (job, created)."""
+        self._purge()
+        key = self.makeKey(kind, params, payload)
+        existing = self._jobs.get(self._by_key.get(key, ""))
+        if existing is not None and existing.status not in (FAILED, CANCELLED):
+            self.deduplicated += 1
+            return existing, False
+
+        queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+        if queued >= self.max_queued:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many queued jobs. Please retry shortly.",
+                headers={"Retry-After": "30"},
+            )
+
+        job = Job(uuid.uuid4().hex, key, kind, params, payload, time.time())
+        job._onChange = self._save
+        self._jobs[job.id] = job
+        self._by_key[key] = job.id
+        self.submitted += 1
+        self._insert(job)
+        self._queue.put_nowait(job.id)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        job = self._jobs.get(job_id)
+        if job is None and self._db is not None:
+            # Accepted by another worker process sharing the store: report its last saved state
+            row = self._db.execute(
+                f"{self._select(payload=False)} WHERE id = ? AND (expires IS NULL OR expires >= ?)",
+                (job_id, time.time()),
+            ).fetchone()
+            job = self._fromRow(row) if row is not None else None
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; finished jobs and other processes' jobs are returned unchanged."""
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED or job.id not in self._jobs:
+            return job
+        job.cancel_requested = True
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED)
+        elif job.task is not None:
+            job.task.cancel()
+        return job
+
+    def stats(self) -> dict:
+        counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {**counts, "workers": self.worker_count, "submitted": self.submitted, "deduplicated": self.deduplicated}
+
+    async def _work(self) -> None:
+        while True:
+            job = self._jobs.get(await self._queue.get())
+            if job is None or job.status != QUEUED:
+                continue
+            job.status = RUNNING
+            job.report("running")
+            job.task = asyncio.create_task(self.handlers[job.kind](job))
+            try:
+                result = await job.task
+            except asyncio.CancelledError:
+                if job.cancel_requested:
+                    self._finish(job, CANCELLED)
+                    continue
+                # The server is shutting down: leave the job queued for the next start
+                job.status = QUEUED
+                job.report("queued", 0.0)
+                raise
+            except HTTPException as e:
+                self._finish(job, FAILED, error={"status": e.status_code, "detail": e.detail})
+            except Exception as e:
+                logger.exception("job failed", extra={"jobId": job.id, "kind": job.kind})
+                self._finish(job, FAILED, error={"status": 500, "detail": f"Job failed: {e}"})
+            else:
+                self._finish(job, SUCCEEDED, result=result)
+            finally:
+                job.task = None
+
+    def _finish(self, job: Job, status: str, result: Optional[dict] = None, error: Optional[dict] = None) -> None:
+        job.status = status
+        job.result = result
+        job.error = error
+        job.payload = None  # the upload is no longer needed
+        job.expires = time.time() + self.result_ttl
+        job.report(status, 1.0 if status == SUCCEEDED else None)
+        if self._db is not None:
+            self._db.execute(f"UPDATE {self.table} SET payload = NULL WHERE id = ?", (job.id,))
+            self._db.commit()
+
+    def _purge(self) -> None:
+        now = time.time()
+        expired = [job for job in self._jobs.values() if job.expires is not None and job.expires < now]
+        for job in expired:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table} WHERE id = ?", (job.id,))
+        if expired and self._db is not None:
+            self._db.commit()
+
+    def _insert(self, job: Job) -> None:
+        if self._db is None:
+            return
+        self._db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (id, key, kind, status, stage, progress, params, payload,"
+            " created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.key, job.kind, job.status, job.stage, job.progress, json.dumps(job.params), job.payload,
+             job.created, job.updated),
+        )
+        self._db.commit()
+
+    def _save(self, job: Job) -> None:
+        # Progress and outcome only; the upload is written once by _insert
+        if self._db is None:
+            return
+        self._db.execute(
+            f"UPDATE {self.table} SET status = ?, stage = ?, progress = ?, result = ?, error = ?, updated = ?,"
+            " expires = ? WHERE id = ?",
+            (
+                job.status, job.stage, job.progress,
+                json.dumps(job.result) if job.result is not None else None,
+                json.dumps(job.error) if job.error is not None else None,
+                job.updated, job.expires, job.id,
+            ),
+        )
+        self._db.commit()
+
+    def _select(self, payload: bool = True) -> str:
+        return (
+            f"SELECT id, key, kind, status, stage, progress, params, {'payload' if payload else 'NULL'}, result,"
+            f" error, created, updated, expires FROM {self.table}"
+        )
+
+    def _fromRow(self, row: tuple) -> Job:
+        job_id, key, kind, status, stage, progress, params, payload, result, error, created, updated, expires = row
+        job = Job(job_id, key, kind, json.loads(params), payload, created)
+        job.status, job.stage, job.progress, job.updated, job.expires = status, stage, progress, updated, expires
+        job.result = json.loads(result) if result else None
+        job.error = json.loads(error) if error else None
+        return job
+
+    def _load(self) -> None:
+        self._db.execute(f"DELETE FROM {self.table} WHERE expires < ?", (time.time(),))
+        self._db.commit()
+        if not self.requeue:
+            # Another worker process owns the stored jobs; they are still readable through get()
+            return
+        for row in self._db.execute(f"{self._select()} ORDER BY created").fetchall():
+            job = self._fromRow(row)
+            job._onChange = self._save
+            self._jobs[job.id] = job
+            self._by_key[job.key] = job.id
+            # Jobs interrupted by a restart start over
+            if job.status in (QUEUED, RUNNING) and job.kind in self.handlers:
+                job.status = QUEUED
+                job.report("queued", 0.0)
+                self._queue.put_nowait(job.id)
+
+
+def getJobQueue(request: Request) -> JobQueue:
+    """FastAPI dependency returning the job queue started in the lifespan hook."""
+    return request.app.state.job_queue
@@ -0,0 +1,242 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000, 300000, 1000000)
+
+# Request header that asks for a Server-Timing response header (or SERVER_TIMING=1 for all requests)
+SERVER_TIMING_REQUEST_HEADER = b"x-server-timing"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labelText(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labelText(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels; `observe` is one bisect and three additions."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labelText(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labelText(self.labelnames, labels)} {total:g}")
+            lines.append(f"{self.name}_count{_labelText(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "bloom_request_duration_seconds", "Time from request start to the end of the response body.",
+    ("endpoint", "method", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "bloom_stage_duration_seconds", "Time spent in one stage of a request (upload read, parse, model call, ...).",
+    ("endpoint", "stage"),
+)
+MODEL_CALL_SECONDS = Histogram(
+    "bloom_model_call_duration_seconds", "Duration of one Gemini call, excluding the admission queue.",
+    ("call", "outcome"),
+)
+MODEL_PROMPT_CHARS = Histogram("bloom_model_prompt_chars", "Prompt size per Gemini call in characters.", ("call",), SIZE_BUCKETS)
+MODEL_RESPONSE_CHARS = Histogram("bloom_model_response_chars", "Response size per Gemini call in characters.", ("call",), SIZE_BUCKETS)
+MODEL_TOKENS = Counter("bloom_model_tokens_total", "Tokens reported by Gemini usage metadata.", ("call", "kind"))
+
+REGISTRY = [REQUEST_SECONDS, STAGE_SECONDS, MODEL_CALL_SECONDS, MODEL_PROMPT_CHARS, MODEL_RESPONSE_CHARS, MODEL_TOKENS]
+
+
+def renderMetrics(extra: Optional[List[str]] = None) -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra or [])
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    """Stages recorded for the current request, used for the histograms and Server-Timing."""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.stages: List[Tuple[str, float]] = []
+
+    @property
+    def endpoint(self) -> str:
+        # Templated routes are labeled by their template so path parameters don't explode labels.
+        # Routes of included routers only know their own path, so static routes use the request
+        # path and templates get back the prefix the request path has in front of them.
+        route = self.scope.get("route")
+        if route is None:
+            return "unmatched"
+        template = getattr(route, "path", "")
+        path = self.scope.get("path", "")
+        if "{" not in template:
+            return path
+        params = {name: str(value) for name, value in self.scope.get("path_params", {}).items()}
+        try:
+            matched = getattr(route, "path_format", template).format(**params)
+        except (KeyError, IndexError, ValueError):
+            return template
+        return path[:-len(matched)] + template if matched and path.endswith(matched) else template
+
+    def serverTiming(self, total: float) -> bytes:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries).encode("latin-1")
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def recordStage(stage: str, seconds: float) -> None:
+    """Record a stage duration for the current request (ignored outside a request)."""
+    timings = _current.get()
+    if timings is None:
+        return
+    timings.stages.append((stage, seconds))
+    STAGE_SECONDS.observe(seconds, timings.endpoint, stage)
+
+
+@contextmanager
+def timeStage(stage: str):
+    """Time the enclosed block as `stage` of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recordStage(stage, time.perf_counter() - started)
+
+
+def recordModelCall(
+    label: str, prompt: str, response_chars: Optional[int], seconds: float, outcome: str, response=None
+) -> None:
+    """Record duration, prompt/response sizes and token usage of one Gemini call."""
+    recordStage("gemini_call", seconds)
+    MODEL_CALL_SECONDS.observe(seconds, label, outcome)
+    MODEL_PROMPT_CHARS.observe(len(prompt), label)
+    if response_chars is not None:
+        MODEL_RESPONSE_CHARS.observe(response_chars, label)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        for kind, attribute in (("prompt", "prompt_token_count"), ("response", "candidates_token_count")):
+            count = getattr(usage, attribute, None)
+            if count:
+                MODEL_TOKENS.inc(label, kind, amount=count)
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson when installed, recording the encoding time as the `serialize` stage.
+
+    orjson also encodes NumPy values directly. Endpoints returning very large payloads
+    (`/importCSV`) return this class themselves, which skips FastAPI's `jsonable_encoder`
+    pass over every value.
+    """
+
+    def render(self, content) -> bytes:
+        with timeStage("serialize"):
+            if orjson is None:
+                return super().render(content)
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request and, on request, adding Server-Timing.
+
+    Send `X-Server-Timing: 1` (or set `SERVER_TIMING=1`) to get the stages recorded before
+    the response started, e.g. `upload_read;dur=2.1, parse_file;dur=35.0, gemini_call;dur=812.4`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.always_timing = os.getenv("SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = RequestTimings(scope)
+        token = _current.set(timings)
+        want_timing = self.always_timing or any(name == SERVER_TIMING_REQUEST_HEADER for name, _ in scope.get("headers", ()))
+        status = 500
+
+        async def sendWithTiming(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if want_timing:
+                    headers = list(message.get("headers", ()))
+                    headers.append((b"server-timing", timings.serverTiming(time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, sendWithTiming)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, timings.endpoint, scope.get("method", ""), str(status))
+            _current.reset(token)
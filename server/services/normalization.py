@@ -0,0 +1,166 @@
+import re
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+# Tried in order; on a tie the earlier (US-style) format wins, matching the app's date handling
+DATE_FORMATS = (
+    "%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%d/%m/%y", "%m-%d-%Y", "%d.%m.%Y",
+    "%Y/%m/%d", "%b %d, %Y", "%d %b %Y", "%B %d, %Y", "%Y%m%d",
+)
+# Distinct date values examined when inferring a file's date format
+DATE_SAMPLE_SIZE = 500
+# Parsed dates remembered per file; timestamp columns can have a distinct value on every row
+DATE_CACHE_LIMIT = 20_000
+
+EXPENSE_WORDS = ("expense", "debit", "withdrawal", "purchase", "payment", "fee", "charge")
+INCOME_WORDS = ("income", "credit", "deposit", "refund", "salary", "payroll", "interest")
+
+# Thousands and decimal separators, written as an example amount; the first wins ties
+AMOUNT_FORMATS = ("1,234.56", "1.234,56")
+
+
+def _amountPattern(fmt: str) -> re.Pattern:
+    # A sign is only allowed in front: "-12", "$-12", "-$12", "+12" or "(12.00)"
+    thousands, decimal = re.escape(fmt[1]), re.escape(fmt[-3])
+    number = rf"(?:\d{{1,3}}(?:{thousands}\d{{3}})+|\d+)(?:{decimal}\d+)?|{decimal}\d+"
+    return re.compile(
+        rf"^(?P<paren>\(\s*)?(?P<sign>[-+])?\s*(?P<lead>[$€£])?\s*(?P<inner>[-+])?\s*"
+        rf"(?P<number>{number})\s*(?P<trail>[$€£])?(?(paren)\s*\))$"
+    )
+
+
+_AMOUNT_PATTERNS = {fmt: _amountPattern(fmt) for fmt in AMOUNT_FORMATS}
+_ISO_PREFIX = re.compile(r"^(\d{4})-(\d{2})-(\d{2})[T ]")
+
+
+def inferAmountFormat(values: np.ndarray) -> Optional[str]:
+    """Pick the `AMOUNT_FORMATS` entry ("1,234.56" or "1.234,56") a file's amounts are written in.
+
+    Only values that parse in one format and not the other count, e.g. "12.50" or
+    "1.234,50"; the format with more of them wins (the US one on a tie). Returns None when
+    no value decides it, i.e. every amount is a plain integer or an ambiguous "1,234".
+    """
+    sample = np.unique(values[values != ""])[:DATE_SAMPLE_SIZE]
+    counts = {fmt: 0 for fmt in AMOUNT_FORMATS}
+    for value in sample.tolist():
+        parsed = [_parseAmount(value, fmt) for fmt in AMOUNT_FORMATS]
+        if np.isnan(parsed[0]) != np.isnan(parsed[1]):
+            counts[AMOUNT_FORMATS[0] if np.isnan(parsed[1]) else AMOUNT_FORMATS[1]] += 1
+    best = max(AMOUNT_FORMATS, key=lambda fmt: counts[fmt])
+    return best if counts[best] else None
+
+
+def parseAmounts(values: np.ndarray, fmt: Optional[str] = None) -> np.ndarray:
+    """Convert amount strings like "$1,234.50", "-12", "$-12.00" or "(40.00)" to floats.
+
+    `fmt` is an `AMOUNT_FORMATS` entry, inferred from `values` when not given. Malformed
+    values ("1-2", "1e3", "--5") are NaN, and so are values whose meaning depends on the
+    format ("1,234") when `values` don't settle it. Each distinct string is parsed once.
+    """
+    if values.size == 0:
+        return np.zeros(0)
+    unique, inverse = np.unique(np.char.strip(values.astype(str)), return_inverse=True)
+    fmt = fmt or inferAmountFormat(unique)
+    if fmt is not None:
+        parsed = [_parseAmount(value, fmt) for value in unique.tolist()]
+    else:
+        # Undecided: keep only values that read the same in every format
+        parsed = [_agreedAmount(value) for value in unique.tolist()]
+    return np.array(parsed, dtype=np.float64)[inverse.reshape(-1)]
+
+
+def _parseAmount(value: str, fmt: str) -> float:
+    match = _AMOUNT_PATTERNS[fmt].match(value)
+    if match is None or (match.group("lead") and match.group("trail")):
+        return np.nan
+    signs = [sign for sign in (match.group("paren"), match.group("sign"), match.group("inner")) if sign]
+    if len(signs) > 1:
+        return np.nan
+    thousands, decimal = fmt[1], fmt[-3]
+    number = float(match.group("number").replace(thousands, "").replace(decimal, "."))
+    return -number if signs and signs[0][0] in "(-" else number
+
+
+def _agreedAmount(value: str) -> float:
+    parsed = {_parseAmount(value, fmt) for fmt in AMOUNT_FORMATS}
+    return parsed.pop() if len(parsed) == 1 else np.nan
+
+
+def amountsToCents(values: np.ndarray, fmt: Optional[str] = None) -> tuple:
+    """Parse amount strings to (absolute integer cents, parsed ok mask, negative mask)."""
+    amounts = parseAmounts(values, fmt)
+    ok = np.isfinite(amounts)
+    cents = np.rint(np.abs(np.where(ok, amounts, 0.0)) * 100).astype(np.int64)
+    return cents, ok, ok & (amounts < 0)
+
+
+def _parseDate(value: str, fmt: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, fmt)
+    except ValueError:
+        return None
+
+
+def inferDateFormat(values: np.ndarray) -> Optional[str]:
+    """Pick the `DATE_FORMATS` entry that parses the most distinct values in a sample."""
+    sample = np.unique(values[values != ""])[:DATE_SAMPLE_SIZE]
+    if sample.size == 0:
+        return None
+    best, best_count = None, 0
+    for fmt in DATE_FORMATS:
+        count = sum(1 for value in sample if _parseDate(value, fmt) is not None)
+        if count > best_count:
+            best, best_count = fmt, count
+    return best
+
+
+def toIsoDates(values: np.ndarray, fmt: Optional[str], cache: Optional[dict] = None) -> np.ndarray:
+    """Convert date strings in `fmt` to ISO `yyyy-MM-dd` ("" when unparseable).
+
+    Each distinct value is parsed once; pass the same `cache` dict across batches of one
+    file to parse it once per file. ISO timestamps ("2024-03-05T10:00:00") keep their date
+    part whatever the inferred format.
+    """
+    if values.size == 0:
+        return np.zeros(0, dtype="<U10")
+    cache = {} if cache is None else cache
+    unique, inverse = np.unique(values, return_inverse=True)
+    converted = []
+    for value in unique.tolist():
+        iso = cache.get(value)
+        if iso is None:
+            iso = _isoDate(value, fmt)
+            if len(cache) < DATE_CACHE_LIMIT:
+                cache[value] = iso
+        converted.append(iso)
+    return np.array(converted, dtype="<U10")[inverse.reshape(-1)]
+
+
+def _isoDate(value: str, fmt: Optional[str]) -> str:
+    parsed = _parseDate(value, fmt) if fmt else None
+    if parsed is not None:
+        return parsed.strftime("%Y-%m-%d")
+    match = _ISO_PREFIX.match(value)
+    return "-".join(match.groups()) if match else ""
+
+
+def canonicalTypes(values: np.ndarray, negative: np.ndarray) -> np.ndarray:
+    """Map transaction type text to "expense"/"income" ("" when it can't be decided).
+
+    Known words decide first (e.g. "Debit", "Payroll"); otherwise a negative amount means
+    an expense.
+    """
+    lowered = np.char.lower(values)
+    is_expense = np.zeros(values.size, dtype=bool)
+    is_income = np.zeros(values.size, dtype=bool)
+    for word in EXPENSE_WORDS:
+        is_expense |= np.char.find(lowered, word) >= 0
+    for word in INCOME_WORDS:
+        is_income |= np.char.find(lowered, word) >= 0
+    return np.select(
+        [is_expense & ~is_income, is_income & ~is_expense, negative],
+        ["expense", "income", "expense"],
+        default="",
+    )
@@ -0,0 +1,157 @@
+import functools
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Optional
+
+# Documents with fewer pages than this are parsed serially; pool overhead isn't worth it
+DEFAULT_PARALLEL_MIN_PAGES = 32
+DEFAULT_PAGE_TIMEOUT_SECONDS = 10.0
+# Pages handed to a worker per task
+PAGES_PER_TASK = 8
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def pdfReaderClass():
+    """PyPDF2's `PdfReader`, imported on first use (None when PyPDF2 isn't installed)."""
+    try:
+        from PyPDF2 import PdfReader
+    except Exception:
+        return None
+    return PdfReader
+
+
+def _workerCount() -> int:
+    return max(1, int(os.getenv("PDF_WORKERS", os.cpu_count() or 1)))
+
+
+def _getPool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+        # spawn rather than fork: the server process has live threads (event loop, thread pools)
+        _pool = ProcessPoolExecutor(max_workers=_workerCount(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdownPdfPool() -> None:
+    """Stop the worker processes; called from the app's lifespan hook on shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _recyclePool(pool: ProcessPoolExecutor) -> None:
+    """Terminate `pool`'s workers and stop handing it out; the next caller gets a fresh pool.
+
+    `Future.cancel()` can't stop a task that is already running, so this is the only way
+    to reclaim a worker stuck on a pathological page. Tasks of other requests still
+    running on the same pool fail with `BrokenExecutor`.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    terminate = getattr(pool, "terminate_workers", None)
+    if terminate is not None:
+        terminate()
+    else:
+        # Python < 3.14 has no public way to stop a running worker
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extractPages(file_content: bytes, start: int, end: int) -> List[str]:
+    # Runs in a worker process, so it must be a picklable module-level function
+    reader = pdfReaderClass()(io.BytesIO(file_content))
+    texts = []
+    for index in range(start, min(end, len(reader.pages))):
+        try:
+            texts.append(reader.pages[index].extract_text() or "")
+        except Exception:
+            # best-effort continue
+            texts.append("")
+    return texts
+
+
+def extractPdfText(file_content: bytes, max_chars: Optional[int] = None) -> str:
+    """Extract page text from PDF bytes, stopping once `max_chars` characters are collected.
+
+    Large documents (`PDF_PARALLEL_MIN_PAGES` pages or more) are split across a process
+    pool of `PDF_WORKERS` workers, one wave of tasks at a time, so pages past the character
+    budget are never parsed. A batch of pages still running after `PDF_PAGE_TIMEOUT_SECONDS`
+    per page is skipped, like pages that fail to parse, and the pool is recycled so the
+    stuck worker is killed. This call blocks; run it off the event loop.
+    """
+    PdfReader = pdfReaderClass()
+    if PdfReader is None:
+        raise RuntimeError("PyPDF2 is required to parse PDF files. Install it with `pip install PyPDF2`.")
+    reader = PdfReader(io.BytesIO(file_content))
+    page_count = len(reader.pages)
+    budget = max_chars if max_chars is not None else float("inf")
+
+    texts: List[str] = []
+    collected = 0
+
+    min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", DEFAULT_PARALLEL_MIN_PAGES))
+    workers = _workerCount()
+    if page_count < min_pages or workers < 2:
+        for page in reader.pages:
+            try:
+                text = page.extract_text() or ""
+            except Exception:
+                # best-effort continue
+                continue
+            texts.append(text)
+            collected += len(text) + 2
+            if collected >= budget:
+                break
+        return "\n\n".join(texts)
+
+    page_timeout = float(os.getenv("PDF_PAGE_TIMEOUT_SECONDS", DEFAULT_PAGE_TIMEOUT_SECONDS))
+    starts = list(range(0, page_count, PAGES_PER_TASK))
+    for wave in range(0, len(starts), workers):
+        pool = _getPool()
+        futures = [
+            pool.submit(_extractPages, file_content, start, start + PAGES_PER_TASK)
+            for start in starts[wave:wave + workers]
+        ]
+        # A wave's tasks run side by side, so they share one deadline
+        wave_deadline = time.monotonic() + page_timeout * PAGES_PER_TASK
+        for future in futures:
+            try:
+                batch = future.result(timeout=max(0.0, wave_deadline - time.monotonic()))
+            except FutureTimeoutError:
+                # Cancelling a running task does nothing; kill the stuck worker with its pool
+                _recyclePool(pool)
+                continue
+            except BrokenExecutor:
+                if pool is not _pool:
+                    # Recycled after a timeout (here or in another request); skip the batch
+                    continue
+                # A worker died; drop the pool so the next request starts a fresh one
+                _recyclePool(pool)
+                raise RuntimeError("PDF worker pool crashed while parsing the file")
+            except Exception:
+                # best-effort continue
+                continue
+            for text in batch:
+                if collected >= budget:
+                    break
+                texts.append(text)
+                collected += len(text) + 2
+        if collected >= budget:
+            for future in futures:
+                future.cancel()
+            break
+    return "\n\n".join(texts)
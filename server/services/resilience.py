@@ -0,0 +1,228 @@
+import asyncio
+import contextvars
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+# Default time budget for a request's model work; the app's HTTP client gives up after 60s
+DEFAULT_REQUEST_DEADLINE_SECONDS = 55.0
+# Clients may ask for a shorter budget with this header, in seconds
+DEADLINE_HEADER = b"x-request-timeout"
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF_BASE_SECONDS = 0.2
+DEFAULT_BACKOFF_MAX_SECONDS = 2.0
+# Retries and hedges may add at most this fraction of first attempts (plus the burst)
+DEFAULT_RETRY_BUDGET_RATIO = 0.2
+DEFAULT_RETRY_BUDGET_BURST = 10.0
+DEFAULT_HEDGE_QUANTILE = 0.95
+# Successful calls observed before the hedge delay is trusted
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 500
+
+# Upstream statuses worth another attempt
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+_budget: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_budget", default=None)
+
+
+class UpstreamError(HTTPException):
+    """HTTPException for one failed model attempt; `transient` failures may be retried."""
+
+    def __init__(self, status_code: int, detail: str, transient: bool):
+        super().__init__(status_code=status_code, detail=detail)
+        self.transient = transient
+
+
+def isTransient(error: BaseException) -> bool:
+    """Timeouts, connection failures and 408/429/5xx responses from the model API."""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return isinstance(code, int) and code in TRANSIENT_STATUS_CODES
+
+
+def requestDeadline() -> Optional[float]:
+    """`time.monotonic()` by which the current request's model work must finish (None outside requests)."""
+    return _deadline.get()
+
+
+@contextmanager
+def itemDeadline():
+    """Give one unit of a long request (a batch item) the request's full budget from now.
+
+    A batch streams for as long as it has items, so holding every item to the deadline set
+    when the request arrived would fail all items after the first `REQUEST_DEADLINE_SECONDS`.
+    """
+    budget = _budget.get()
+    if budget is None:
+        yield
+        return
+    token = _deadline.set(time.monotonic() + budget)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def deadlineExceeded(label: str) -> HTTPException:
+    return HTTPException(status_code=504, detail=f"{label} ran past the request deadline")
+
+
+class DeadlineMiddleware:
+    """Start each HTTP request's deadline clock for the model calls it makes.
+
+    The budget is `REQUEST_DEADLINE_SECONDS`, or less when the client sends
+    `X-Request-Timeout: <seconds>`. Model calls, their retries and their admission wait
+    all stop at the deadline with a 504, instead of finishing after the client gave up.
+    Batch endpoints apply the budget to each item instead (see `itemDeadline`).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.budget = float(os.getenv("REQUEST_DEADLINE_SECONDS", DEFAULT_REQUEST_DEADLINE_SECONDS))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = self.budget
+        for name, value in scope.get("headers", ()):
+            if name == DEADLINE_HEADER:
+                try:
+                    budget = min(budget, max(0.0, float(value)))
+                except ValueError:
+                    pass
+        budget_token = _budget.set(budget)
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+            _budget.reset(budget_token)
+
+
+class RetryBudget:
+    """Token bucket bounding retries and hedges to a fraction of first attempts.
+
+    Every first attempt deposits `ratio` tokens (up to `burst`); every retry or hedge
+    spends one. When the model is failing for everyone the bucket empties, and calls fail
+    fast instead of multiplying the load on an upstream that is already struggling.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def deposit(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class CallPolicy:
+    """Retry, backoff and hedging settings plus the state they need, one per process.
+
+    Retries use full-jitter exponential backoff: a random delay up to
+    `backoff_base * 2**(attempt - 1)`, capped at `backoff_max`. With `hedge` on, a second
+    copy of a call is started once it has run longer than the `hedge_quantile` of recent
+    successful calls, and the first answer wins.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_base: float = DEFAULT_BACKOFF_BASE_SECONDS,
+        backoff_max: float = DEFAULT_BACKOFF_MAX_SECONDS,
+        budget_ratio: float = DEFAULT_RETRY_BUDGET_RATIO,
+        budget_burst: float = DEFAULT_RETRY_BUDGET_BURST,
+        hedge: bool = False,
+        hedge_quantile: float = DEFAULT_HEDGE_QUANTILE,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = RetryBudget(budget_ratio, budget_burst)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.calls = 0
+        self.retries = 0
+        self.retries_denied = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._observed = 0
+        self._hedge_delay: Optional[float] = None
+        self._rng = random.Random()
+
+    @classmethod
+    def fromEnv(cls) -> "CallPolicy":
+        return cls(
+            max_attempts=int(os.getenv("MODEL_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+            backoff_base=float(os.getenv("MODEL_BACKOFF_BASE_SECONDS", DEFAULT_BACKOFF_BASE_SECONDS)),
+            backoff_max=float(os.getenv("MODEL_BACKOFF_MAX_SECONDS", DEFAULT_BACKOFF_MAX_SECONDS)),
+            budget_ratio=float(os.getenv("MODEL_RETRY_BUDGET_RATIO", DEFAULT_RETRY_BUDGET_RATIO)),
+            hedge=os.getenv("MODEL_HEDGE", "").lower() in ("1", "true", "yes"),
+            hedge_quantile=float(os.getenv("MODEL_HEDGE_QUANTILE", DEFAULT_HEDGE_QUANTILE)),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        return self._rng.uniform(0.0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def observe(self, seconds: float) -> None:
+        """Record the duration of a successful call for the hedge delay."""
+        self._latencies.append(seconds)
+        self._observed += 1
+        # Re-sorting the window on every call would cost more than the estimate is worth
+        if len(self._latencies) >= HEDGE_MIN_SAMPLES and (self._hedge_delay is None or self._observed % 25 == 0):
+            ordered = sorted(self._latencies)
+            self._hedge_delay = ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_quantile))]
+
+    def hedgeDelay(self) -> Optional[float]:
+        return self._hedge_delay if self.hedge else None
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "retriesDenied": self.retries_denied,
+            "hedges": self.hedges,
+            "hedgeWins": self.hedge_wins,
+            "hedgeDelaySeconds": round(self._hedge_delay, 4) if self._hedge_delay is not None else None,
+            "budgetTokens": round(self.budget.tokens, 2),
+        }
+
+
+_policy: Optional[CallPolicy] = None
+
+
+def startResilience() -> None:
+    """Create the process-wide call policy; called from the lifespan hook."""
+    global _policy
+    _policy = CallPolicy.fromEnv()
+
+
+def stopResilience() -> None:
+    global _policy
+    _policy = None
+
+
+def callPolicy() -> Optional[CallPolicy]:
+    """The process-wide policy, or None (one attempt, no hedging) when it isn't started."""
+    return _policy
+
+
+def resilienceStats() -> Optional[dict]:
+    return _policy.stats() if _policy is not None else None
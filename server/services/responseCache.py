@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request
+
+DEFAULT_TTL_SECONDS = 600.0
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class ResponseCache:
+    """Content-addressed LRU cache for JSON endpoint responses.
+
+    Entries expire after `ttl_seconds` and the least recently used ones are evicted once
+    `max_entries` or `max_bytes` is exceeded. When `path` is given, entries are written
+    through to a sqlite file and reloaded on startup so they survive restarts; a key missing
+    from memory is also looked up in the file, so worker processes sharing it see each
+    other's entries.
+    """
+
+    table = "response_cache"
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        path: Optional[str] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        # key -> (expires_at, size, serialized value)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table}"
+                " (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+            )
+            self._load()
+
+    @classmethod
+    def fromEnv(cls) -> "ResponseCache":
+        return cls(
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            path=os.getenv("RESPONSE_CACHE_PATH") or None,
+        )
+
+    @staticmethod
+    def makeKey(endpoint: str, model: str, system_instruction: str, payload: str) -> str:
+        """Hash the request identity; whitespace differences in the payload map to the same key."""
+        normalized = " ".join(payload.split())
+        digest = hashlib.sha256()
+        for part in (endpoint, model, system_instruction, normalized):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            entry = self._readThrough(key)
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return json.loads(entry[2])
+
+    def set(self, key: str, value: dict) -> None:
+        serialized = json.dumps(value)
+        size = len(key) + len(serialized.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        expires_at = time.time() + self.ttl_seconds
+        self._entries[key] = (expires_at, size, serialized)
+        self.total_bytes += size
+        if self._db is not None:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, serialized),
+            )
+            self._db.commit()
+        self._evict()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+        if self._db is not None:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _readThrough(self, key: str) -> Optional[tuple]:
+        row = self._db.execute(
+            f"SELECT expires_at, value FROM {self.table} WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        expires_at, serialized = row
+        entry = (expires_at, len(key) + len(serialized.encode("utf-8")), serialized)
+        self._entries[key] = entry
+        self.total_bytes += entry[1]
+        self._evict()
+        return entry
+
+    def _load(self) -> None:
+        now = time.time()
+        self._db.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+        self._db.commit()
+        rows = self._db.execute(
+            f"SELECT key, expires_at, value FROM {self.table} ORDER BY expires_at"
+        ).fetchall()
+        for key, expires_at, serialized in rows:
+            size = len(key) + len(serialized.encode("utf-8"))
+            self._entries[key] = (expires_at, size, serialized)
+            self.total_bytes += size
+        self._evict()
+
+
+def getResponseCache(request: Request) -> ResponseCache:
+    """FastAPI dependency returning the shared cache created in the lifespan hook."""
+    return request.app.state.response_cache
+
+
+def cacheBypassed(request: Request) -> bool:
+    """True when the client sent `Cache-Control: no-cache` and wants a fresh model response."""
+    return "no-cache" in request.headers.get("cache-control", "").lower()
@@ -0,0 +1,86 @@
+import json
+import time
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+STREAM_FORMATS = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def dumpJson(data) -> str:
+    return orjson.dumps(data).decode("utf-8") if orjson is not None else json.dumps(data)
+
+
+def encodeEvent(event: str, data: dict, fmt: str) -> str:
+    """Serialize one event as a Server-Sent Event or as a single NDJSON line."""
+    if fmt == "ndjson":
+        return dumpJson({"event": event, **data}) + "\n"
+    return f"event: {event}\ndata: {dumpJson(data)}\n\n"
+
+
+def checkStreamFormat(fmt: str) -> None:
+    """Reject an unknown `?format=`; endpoints call it before doing any model work."""
+    if fmt not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format: {fmt}. Use one of: {', '.join(STREAM_FORMATS)}")
+
+
+def streamTextResponse(
+    http_request: Request, chunks: AsyncIterator[str], fmt: str = "sse", headers: Optional[dict] = None
+) -> StreamingResponse:
+    """Forward model text chunks to the client as `token` events followed by a `done` event.
+
+    Chunks are pulled one at a time, so a slow client slows down the upstream read instead
+    of buffering the answer in memory. When the client disconnects the upstream generator is
+    closed, which aborts the model call. The `done` event carries timing metadata; upstream
+    failures after the response has started are reported as an `error` event (with
+    `retryAfter` seconds when the model queue was full).
+    """
+    checkStreamFormat(fmt)
+
+    async def events():
+        started = time.perf_counter()
+        first_token_at = None
+        chunk_count = 0
+        char_count = 0
+        try:
+            async for text in chunks:
+                if await http_request.is_disconnected():
+                    return
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunk_count += 1
+                char_count += len(text)
+                yield encodeEvent("token", {"text": text}, fmt)
+            finished = time.perf_counter()
+            yield encodeEvent(
+                "done",
+                {
+                    "timeToFirstTokenMs": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                    "totalMs": round((finished - started) * 1000, 1),
+                    "chunks": chunk_count,
+                    "characters": char_count,
+                },
+                fmt,
+            )
+        except HTTPException as e:
+            error = {"status": e.status_code, "detail": e.detail}
+            if e.headers and "Retry-After" in e.headers:
+                error["retryAfter"] = int(e.headers["Retry-After"])
+            yield encodeEvent("error", error, fmt)
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type=STREAM_FORMATS[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})},
+    )
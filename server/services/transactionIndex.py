@@ -0,0 +1,231 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import Request
+
+DEFAULT_MAX_USERS = 1000
+# How long an import's fingerprints wait for the client to confirm it stored the rows
+DEFAULT_PENDING_TTL_SECONDS = 86400.0
+# Unconfirmed imports kept in memory when there is no sqlite file
+DEFAULT_MAX_PENDING = 10000
+
+
+class TransactionIndex:
+    """Per-user set of fingerprints of already imported transactions, for idempotent re-imports.
+
+    A fingerprint is a 64-bit hash of the normalized (date, amount, type, name, payment
+    method) tuple plus its occurrence number within the file, so two identical coffees on
+    the same day stay two transactions while re-uploading an overlapping export only
+    returns the rows not seen before. Lookups are set membership per batch; with `path`,
+    fingerprints are bulk-inserted into sqlite and loaded once per user. At most
+    `max_users` users' sets are kept in memory (least recently used are dropped and
+    reloaded on demand; without `path` they are forgotten). Import batches run in
+    threadpool workers, hence the lock.
+
+    An import's new fingerprints are only staged under an import token. They count as
+    imported once the client confirms the token after storing the rows, so an import whose
+    response never arrived (timeout, dropped stream) returns the same rows when retried.
+    Unconfirmed tokens expire after `pending_ttl` seconds.
+    """
+
+    table = "transaction_index"
+    pending_table = "transaction_index_pending"
+
+    def __init__(
+        self,
+        max_users: int = DEFAULT_MAX_USERS,
+        path: Optional[str] = None,
+        pending_ttl: float = DEFAULT_PENDING_TTL_SECONDS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        self.max_users = max_users
+        self.pending_ttl = pending_ttl
+        self.max_pending = max_pending
+        self.checked = 0
+        self.duplicates = 0
+        self.confirmed = 0
+        self._users: "OrderedDict[str, Set[int]]" = OrderedDict()
+        # token -> (user_id, fingerprints, staged at); only used without sqlite
+        self._pending: "OrderedDict[str, Tuple[str, List[int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table}"
+                " (user_id TEXT, fingerprint INTEGER, PRIMARY KEY (user_id, fingerprint)) WITHOUT ROWID"
+            )
+            # Shared through the file, so any worker process can confirm a token
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.pending_table}"
+                " (token TEXT, user_id TEXT, fingerprint INTEGER, staged REAL)"
+            )
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {self.pending_table}_token ON {self.pending_table} (token)")
+
+    @classmethod
+    def fromEnv(cls) -> "TransactionIndex":
+        return cls(
+            max_users=int(os.getenv("TRANSACTION_INDEX_MAX_USERS", DEFAULT_MAX_USERS)),
+            path=os.getenv("TRANSACTION_INDEX_PATH") or None,
+            pending_ttl=float(os.getenv("TRANSACTION_INDEX_PENDING_TTL_SECONDS", DEFAULT_PENDING_TTL_SECONDS)),
+        )
+
+    @staticmethod
+    def fingerprints(transactions: List[dict], occurrences: Dict[str, int]) -> List[int]:
+        """Fingerprint normalized transactions; `occurrences` carries counts across a file's batches."""
+        keys = []
+        for transaction in transactions:
+            name = " ".join(transaction["transactionName"].lower().split())
+            payment = " ".join(transaction["paymentMethod"].lower().split())
+            base = (
+                f"{transaction['isoDate']}\x1f{transaction['amountCents']}\x1f{transaction['normalizedType']}"
+                f"\x1f{name}\x1f{payment}"
+            )
+            seen = occurrences.get(base, 0)
+            occurrences[base] = seen + 1
+            digest = hashlib.blake2b(f"{base}\x1f{seen}".encode("utf-8"), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "big", signed=True))
+        return keys
+
+    def filterNew(self, user_id: str, transactions: List[dict], occurrences: Dict[str, int]) -> List[dict]:
+        """Return the transactions not imported before by `user_id` and record them as imported right away.
+
+        For callers that already hold the rows (e.g. seeding an index); imports go through `newOnly`.
+        """
+        fresh, keys = self._filter(user_id, transactions, occurrences)
+        self._record(user_id, keys)
+        return fresh
+
+    def newOnly(self, user_id: str, batches: Iterator[List[dict]], counts: dict) -> Iterator[List[dict]]:
+        """Filter a stream of import batches, adding `duplicateRows` to `counts`.
+
+        When the stream has been read to the end, the new fingerprints are staged and
+        `counts["importToken"]` is set (None if nothing was new); nothing is recorded until
+        `confirm` is called with that token. A stream closed early stages nothing.
+        """
+        occurrences: Dict[str, int] = {}
+        counts.setdefault("duplicateRows", 0)
+        staged: List[int] = []
+        for batch in batches:
+            fresh, keys = self._filter(user_id, batch, occurrences)
+            counts["duplicateRows"] += len(batch) - len(fresh)
+            staged.extend(keys)
+            if fresh:
+                yield fresh
+        counts["importToken"] = self._stage(user_id, staged) if staged else None
+
+    def confirm(self, user_id: str, token: str) -> Optional[int]:
+        """Record the fingerprints staged under `token` as imported; None if it is unknown or expired."""
+        with self._lock:
+            self._purgePending()
+            if self._db is not None:
+                rows = self._db.execute(
+                    f"SELECT fingerprint FROM {self.pending_table} WHERE token = ? AND user_id = ?", (token, user_id)
+                ).fetchall()
+                if not rows:
+                    return None
+                keys = [key for key, in rows]
+                self._db.execute(f"DELETE FROM {self.pending_table} WHERE token = ?", (token,))
+            else:
+                entry = self._pending.get(token)
+                if entry is None or entry[0] != user_id:
+                    return None
+                del self._pending[token]
+                keys = entry[1]
+        self._record(user_id, keys)
+        self.confirmed += 1
+        return len(keys)
+
+    def forget(self, user_id: str) -> None:
+        """Drop a user's index so their next import returns every row again."""
+        with self._lock:
+            self._users.pop(user_id, None)
+            for token in [token for token, entry in self._pending.items() if entry[0] == user_id]:
+                del self._pending[token]
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table} WHERE user_id = ?", (user_id,))
+                self._db.execute(f"DELETE FROM {self.pending_table} WHERE user_id = ?", (user_id,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "checkedRows": self.checked,
+            "duplicateRows": self.duplicates,
+            "duplicateRatio": round(self.duplicates / self.checked, 4) if self.checked else 0.0,
+            "confirmedImports": self.confirmed,
+            "usersLoaded": len(self._users),
+            "fingerprintsLoaded": sum(len(keys) for keys in self._users.values()),
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _filter(self, user_id: str, transactions: List[dict], occurrences: Dict[str, int]) -> Tuple[List[dict], List[int]]:
+        keys = self.fingerprints(transactions, occurrences)
+        with self._lock:
+            known = self._known(user_id)
+            fresh = [(key, transaction) for key, transaction in zip(keys, transactions) if key not in known]
+            self.checked += len(transactions)
+            self.duplicates += len(transactions) - len(fresh)
+        return [transaction for _, transaction in fresh], [key for key, _ in fresh]
+
+    def _record(self, user_id: str, keys: List[int]) -> None:
+        with self._lock:
+            self._known(user_id).update(keys)
+            if self._db is not None:
+                self._db.executemany(
+                    f"INSERT OR IGNORE INTO {self.table} (user_id, fingerprint) VALUES (?, ?)",
+                    ((user_id, key) for key in keys),
+                )
+                self._db.commit()
+
+    def _stage(self, user_id: str, keys: List[int]) -> str:
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._purgePending()
+            if self._db is not None:
+                self._db.executemany(
+                    f"INSERT INTO {self.pending_table} (token, user_id, fingerprint, staged) VALUES (?, ?, ?, ?)",
+                    ((token, user_id, key, now) for key in keys),
+                )
+                self._db.commit()
+            else:
+                self._pending[token] = (user_id, keys, now)
+                while len(self._pending) > self.max_pending:
+                    self._pending.popitem(last=False)
+        return token
+
+    def _purgePending(self) -> None:
+        cutoff = time.time() - self.pending_ttl
+        if self._db is not None:
+            self._db.execute(f"DELETE FROM {self.pending_table} WHERE staged < ?", (cutoff,))
+            return
+        while self._pending and next(iter(self._pending.values()))[2] < cutoff:
+            self._pending.popitem(last=False)
+
+    def _known(self, user_id: str) -> Set[int]:
+        known = self._users.get(user_id)
+        if known is None:
+            known = set()
+            if self._db is not None:
+                rows = self._db.execute(f"SELECT fingerprint FROM {self.table} WHERE user_id = ?", (user_id,))
+                known.update(key for key, in rows)
+            self._users[user_id] = known
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+        return known
+
+
+def getTransactionIndex(request: Request) -> TransactionIndex:
+    """FastAPI dependency returning the shared transaction index created in the lifespan hook."""
+    return request.app.state.transaction_index